@@ -3,14 +3,9 @@ from discord.ext import commands
 import datetime
 import sqlite3
 import os
-import logging
+from services.logs import get_logger
 
-logger = logging.getLogger('Advertisement.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/Advertisement.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+logger = get_logger('Advertisement.py')
 logger.info("Advertisement Cog Loaded. Logging started...")
 
 class Advertisement(commands.Cog):
@@ -1,22 +1,32 @@
 import discord
 from discord.ext import commands, tasks
 import sqlite3
-import requests
 import asyncio
 import os
-import logging
-
-logger = logging.getLogger('AnilistFeed.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/AnilistFeed.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+from services.logs import get_logger
+import heapq
+import time
+
+logger = get_logger('AnilistFeed.py')
 logger.info("AnilistFeed Cog Loaded. Logging started...")
 
+TICK_SECONDS = 30  # How often the scheduler wakes up to poll users that are due
+NAIVE_INTERVAL = 120  # The old fixed schedule, kept for the requests-vs-naive comparison
+FAST_INTERVAL = 60  # Users who just posted an activity get polled this often
+MAX_INTERVAL = 6 * 60 * 60  # Idle users back off to at most once every 6 hours
+USER_NOT_FOUND = -1  # fetch_anilist_user_id result when AniList has no such user, None means the request failed
+REQUESTS_PER_MINUTE = 60  # Global ceiling, well under AniList's 90/min limit
+REQUESTS_PER_POLL = 2  # User id lookup (until cached) + latest activity
+
 class AnilistFeed(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.http = bot.http_service
+        self.poll_queue = []  # heap of (next_poll, user_id)
+        self.poll_state = {}  # user_id: {'username', 'anilist_id', 'interval', 'next_poll', 'seeded'}
+        self.tick_stats = {'requests': 0, 'naive': 0, 'polled': 0, 'deferred': 0}
+        self.total_requests = 0
+        self.total_naive = 0
         self.feed_db_path = 'data/db/anilistfeed.db'
         os.makedirs(os.path.dirname(self.feed_db_path), exist_ok=True)
         self.feed_conn = sqlite3.connect(self.feed_db_path)
@@ -52,56 +62,166 @@ class AnilistFeed(commands.Cog):
         
         await interaction.response.send_message(f"AniList feed updates will be posted in {channel.mention}.")
         
-    @tasks.loop(seconds=120)
+    def initial_interval(self, created_at):
+        """Picks a starting interval from how long ago the user's latest activity was."""
+        if not created_at:
+            return NAIVE_INTERVAL
+        age = max(0, time.time() - created_at)
+        # Poll at roughly a tenth of the time since their last activity
+        return int(min(MAX_INTERVAL, max(FAST_INTERVAL, age / 10)))
+
+    def sync_poll_queue(self, users):
+        """Adds newly linked users to the queue and forgets unlinked ones."""
+        now = time.time()
+        current = {}
+        for user_id, username in users:
+            current[user_id] = username
+            state = self.poll_state.get(user_id)
+            if state is None or state['username'] != username:
+                self.poll_state[user_id] = {'username': username, 'anilist_id': None, 'interval': NAIVE_INTERVAL, 'next_poll': now, 'seeded': False}
+                heapq.heappush(self.poll_queue, (now, user_id))
+        for user_id in list(self.poll_state):
+            if user_id not in current:
+                del self.poll_state[user_id]
+        # Stale heap entries (removed users or rescheduled ones) are skipped when popped
+
+    def reschedule(self, user_id, interval):
+        state = self.poll_state[user_id]
+        state['interval'] = interval
+        state['next_poll'] = time.time() + interval
+        heapq.heappush(self.poll_queue, (state['next_poll'], user_id))
+
+    @commands.command(hidden=True)
+    async def anifeedstats(self, ctx):
+        """Shows AniList feed polling cost compared to the fixed 120 second schedule."""
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.send("You don't have permission to use this command.")
+            return
+        intervals = [state['interval'] for state in self.poll_state.values()]
+        embed = discord.Embed(title="AniList Feed Polling", color=discord.Color.blue())
+        embed.add_field(name="Linked Users", value=len(intervals), inline=True)
+        embed.add_field(name="Fast Lane", value=sum(1 for i in intervals if i <= FAST_INTERVAL), inline=True)
+        embed.add_field(name="Backed Off", value=sum(1 for i in intervals if i >= MAX_INTERVAL), inline=True)
+        embed.add_field(name="Last Tick", value=f"{self.tick_stats['requests']} requests (naive: {self.tick_stats['naive']})", inline=False)
+        embed.add_field(name="Deferred Last Tick", value=self.tick_stats['deferred'], inline=True)
+        embed.add_field(name="Since Startup", value=f"{self.total_requests} requests (naive: {self.total_naive})", inline=False)
+        await ctx.send(embed=embed)
+
+    @tasks.loop(seconds=TICK_SECONDS)
     async def check_anilist_updates(self):
-        logger.warning("Checking for updates. Possible high API calls.")
         # Connect to the AniList and activity databases
         anilist_conn = sqlite3.connect('data/db/anilist.db')
         anilist_c = anilist_conn.cursor()
         activity_conn = sqlite3.connect('data/db/anilistactivity.db')
         activity_c = activity_conn.cursor()
     
-        # Fetch all users and their AniList usernames
-        anilist_c.execute("SELECT id, username FROM usernames")
-        users = anilist_c.fetchall()
-    
-        for user_id, username in users:
-            logger.info(f"Fetching latest activity for {username} | {user_id}")
-            # Fetch the AniList user ID and their latest activity
-            anilist_user_id = self.fetch_anilist_user_id(username)
-            if anilist_user_id:
-                activity = self.fetch_latest_activity(anilist_user_id)
-                if activity:
+        try:
+            # Fetch all users and their AniList usernames
+            anilist_c.execute("SELECT id, username FROM usernames")
+            users = anilist_c.fetchall()
+            self.sync_poll_queue(users)
+
+            budget = REQUESTS_PER_MINUTE * TICK_SECONDS // 60
+            requests_made = 0
+            polled = 0
+            now = time.time()
+
+            while self.poll_queue and self.poll_queue[0][0] <= now:
+                next_poll, user_id = self.poll_queue[0]
+                state = self.poll_state.get(user_id)
+                if state is None or state['next_poll'] != next_poll:
+                    heapq.heappop(self.poll_queue)
+                    continue
+                cost = 1 if state['anilist_id'] else REQUESTS_PER_POLL
+                if requests_made + cost > budget:
+                    break  # Out of budget, the rest stay queued for the next tick
+                heapq.heappop(self.poll_queue)
+                polled += 1
+                try:
+                    username = state['username']
+
+                    logger.info(f"Fetching latest activity for {username} | {user_id}")
+                    # Fetch the AniList user ID once, then only the latest activity
+                    if not state['anilist_id']:
+                        anilist_user_id = await self.fetch_anilist_user_id(username)
+                        requests_made += 1
+                        if anilist_user_id == USER_NOT_FOUND:
+                            # Only a confirmed unknown name waits the full interval
+                            self.reschedule(user_id, MAX_INTERVAL)
+                            continue
+                        if not anilist_user_id:
+                            # Error or rate limit, back off like a failed activity fetch
+                            self.reschedule(user_id, min(MAX_INTERVAL, state['interval'] * 2))
+                            continue
+                        state['anilist_id'] = anilist_user_id
+                    anilist_user_id = state['anilist_id']
+
+                    activity = await self.fetch_latest_activity(anilist_user_id)
+                    requests_made += 1
+                    if not activity:
+                        self.reschedule(user_id, min(MAX_INTERVAL, state['interval'] * 2))
+                        continue
+
                     # Check if this activity is already posted
                     logger.info(f"Checking if activity for {username} is new")
                     activity_c.execute("SELECT last_activity_id FROM last_activity WHERE user_id=?", (user_id,))
                     last_activity_id = activity_c.fetchone()
-                    if not last_activity_id or last_activity_id[0] != activity['id']:
-                        # Post the update to all servers where the user is a member
-                        logger.info(f"New Activity for {username} found.")
-                        for guild in self.bot.guilds:
-                            member = guild.get_member(user_id)
-                            if member:
-                                self.feed_c.execute("SELECT channel_id FROM feed_channels WHERE guild_id=?", (guild.id,))
-                                channel_id = self.feed_c.fetchone()
-                                if channel_id:
-                                    channel = guild.get_channel(channel_id[0])
-                                    if channel:
-                                        message = f"{member.mention}, {activity['status']} {activity['media_name']}.\n[View Here]({activity['link']})"
-                                        await channel.send(message)
-                                        logger.info(f"Update sent to {channel_id}")
-                                        await asyncio.sleep(1)
-    
-                        # Update the last activity ID for the user
-                        logger.info(f"Updating last activity ID for {username}")
-                        activity_c.execute("INSERT OR REPLACE INTO last_activity (user_id, last_activity_id) VALUES (?, ?)", (user_id, activity['id']))
-                        activity_conn.commit()
-    
-        # Close the database connections
-        activity_conn.close()
-        anilist_conn.close()
+                    if last_activity_id and last_activity_id[0] == activity['id']:
+                        # Nothing new, back off exponentially (first poll seeds from the activity age)
+                        if not state['seeded']:
+                            state['seeded'] = True
+                            interval = self.initial_interval(activity.get('created_at'))
+                        else:
+                            interval = min(MAX_INTERVAL, state['interval'] * 2)
+                        self.reschedule(user_id, interval)
+                        continue
+
+                    # Post the update to all servers where the user is a member
+                    logger.info(f"New Activity for {username} found.")
+                    for guild in self.bot.guilds:
+                        member = guild.get_member(user_id)
+                        if member:
+                            self.feed_c.execute("SELECT channel_id FROM feed_channels WHERE guild_id=?", (guild.id,))
+                            channel_id = self.feed_c.fetchone()
+                            if channel_id:
+                                channel = guild.get_channel(channel_id[0])
+                                if channel:
+                                    message = f"{member.mention}, {activity['status']} {activity['media_name']}.\n[View Here]({activity['link']})"
+                                    await channel.send(message)
+                                    logger.info(f"Update sent to {channel_id}")
+                                    await asyncio.sleep(1)
+
+                    # Update the last activity ID for the user
+                    logger.info(f"Updating last activity ID for {username}")
+                    activity_c.execute("INSERT OR REPLACE INTO last_activity (user_id, last_activity_id) VALUES (?, ?)", (user_id, activity['id']))
+                    activity_conn.commit()
+                    # Recently active users go into the fast lane
+                    state['seeded'] = True
+                    self.reschedule(user_id, FAST_INTERVAL)
+                except Exception as e:
+                    # A network error or an unreadable response, the user stays queued with a longer interval
+                    logger.error(f"Polling AniList for {state['username']} | {user_id} failed: {e!r}")
+                    self.reschedule(user_id, min(MAX_INTERVAL, state['interval'] * 2))
+
+            # Compare against polling every user (2 requests each) every NAIVE_INTERVAL seconds
+            naive = round(len(self.poll_state) * 2 * TICK_SECONDS / NAIVE_INTERVAL)
+            self.tick_stats = {'requests': requests_made, 'naive': naive, 'polled': polled,
+                               'deferred': sum(1 for state in self.poll_state.values() if state['next_poll'] <= now)}
+            self.total_requests += requests_made
+            self.total_naive += naive
+            if requests_made:
+                logger.info(f"Tick made {requests_made} requests for {polled} users (naive schedule: {naive}).")
+        finally:
+            # Close the database connections
+            activity_conn.close()
+            anilist_conn.close()
         
-    def fetch_anilist_user_id(self, username):
+    async def post_graphql(self, query, variables):
+        """Posts a query to AniList through the shared HTTP service, returning (status, data)."""
+        async with self.http.post('https://graphql.anilist.co', json={'query': query, 'variables': variables}) as response:
+            return response.status, await response.json(content_type=None)
+
+    async def fetch_anilist_user_id(self, username):
         query = '''
         query ($username: String) {
             User(name: $username) {
@@ -110,15 +230,16 @@ class AnilistFeed(commands.Cog):
         }
         '''
         variables = {'username': username}
-        response = requests.post('https://graphql.anilist.co', json={'query': query, 'variables': variables})
+        status, data = await self.post_graphql(query, variables)
 
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200 and (data.get('data') or {}).get('User'):
             return data['data']['User']['id']
+        elif status in (200, 404):
+            return USER_NOT_FOUND
         else:
             return None
 
-    def fetch_latest_activity(self, anilist_user_id):
+    async def fetch_latest_activity(self, anilist_user_id):
         query = '''
         query ($userId: Int) {
           Page(page: 1, perPage: 1) {
@@ -142,10 +263,9 @@ class AnilistFeed(commands.Cog):
         }
         '''
         variables = {'userId': anilist_user_id}
-        response = requests.post('https://graphql.anilist.co', json={'query': query, 'variables': variables})
+        status, data = await self.post_graphql(query, variables)
     
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             activities = data['data']['Page']['activities']
             if activities:
                 activity = activities[0]
@@ -155,10 +275,15 @@ class AnilistFeed(commands.Cog):
                     'status': activity['status'],
                     'media_name': activity['media']['title']['english'] or activity['media']['title']['romaji'],
                     'link': activity['media']['siteUrl'],
-                    'media_type': media_type  # Include the type of media in the return data
+                    'media_type': media_type,  # Include the type of media in the return data
+                    'created_at': activity['createdAt']
                 }
         return None
 
+    def cog_unload(self):
+        self.check_anilist_updates.cancel()
+        self.feed_conn.close()
+
     @check_anilist_updates.before_loop
     async def before_check_anilist_updates(self):
         await self.bot.wait_until_ready()
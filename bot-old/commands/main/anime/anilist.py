@@ -2,20 +2,63 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import sqlite3
-import requests
-import aiohttp
 import os
 import asyncio
-import logging
-
-logger = logging.getLogger('AniList.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/AniList.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+from services.logs import get_logger
+import time
+import math
+from array import array
+
+logger = get_logger('AniList.py')
 logger.info("AniList Cog Loaded. Logging started...")
 
+LIST_CACHE_TTL = 15 * 60  # Cached lists are trusted without any API call for this long
+COMPARE_PAGE_SIZE = 20
+COMPARE_CATEGORIES = {
+    "all": None,
+    "planned": "PLANNING",
+    "watched": "COMPLETED",
+    "watching": "CURRENT",
+}
+
+class ComparePages(discord.ui.View):
+    """Pages through a long list of compare results with Previous/Next buttons."""
+    def __init__(self, author_id, title, header, lines):
+        super().__init__(timeout=300)
+        self.author_id = author_id
+        self.title = title
+        self.header = header
+        self.pages = [lines[i:i + COMPARE_PAGE_SIZE] for i in range(0, len(lines), COMPARE_PAGE_SIZE)] or [[]]
+        self.page = 0
+        self.update_buttons()
+
+    def build_embed(self):
+        description = self.header
+        if self.pages[self.page]:
+            description += "\n\n" + "\n".join(self.pages[self.page])
+        embed = discord.Embed(title=self.title, description=description, color=discord.Color.blue())
+        embed.set_footer(text=f"Page {self.page + 1}/{len(self.pages)}")
+        return embed
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= len(self.pages) - 1
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.author_id
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
 class AniList(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -24,16 +67,28 @@ class AniList(commands.Cog):
         self.conn = sqlite3.connect(self.db_path)  # Open connection
         self.c = self.conn.cursor()  # Create a cursor
         self.create_database()
+        self.http = bot.http_service
+        self.list_cache = {}  # discord user id: in-memory copy of the cached list (see load_cached_list)
 
     def create_database(self):
         self.c.execute('''CREATE TABLE IF NOT EXISTS usernames
                       (id INTEGER PRIMARY KEY, username TEXT)''')
+        self.c.execute('''CREATE TABLE IF NOT EXISTS list_cache
+                      (user_id INTEGER, media_id INTEGER, status TEXT, score REAL, title TEXT,
+                       PRIMARY KEY (user_id, media_id))''')
+        self.c.execute('''CREATE TABLE IF NOT EXISTS list_cache_meta
+                      (user_id INTEGER PRIMARY KEY, username TEXT, updated_at INTEGER, checked_at REAL)''')
         self.conn.commit()
 
     def cog_unload(self):
         """Closes the database connection when the cog is unloaded."""
         self.conn.close()  # Close the connection when the cog is unloaded
 
+    async def post_graphql(self, query, variables):
+        """Posts a query to AniList through the shared HTTP service, returning (status, data)."""
+        async with self.http.post('https://graphql.anilist.co', json={'query': query, 'variables': variables}) as response:
+            return response.status, await response.json(content_type=None)
+
     #Old needs removed after slash update.
     @commands.group()
     async def anilist(self, ctx):
@@ -82,10 +137,9 @@ class AniList(commands.Cog):
         '''
         variables = {'username': username}
 
-        response = await asyncio.to_thread(requests.post, 'https://graphql.anilist.co', json={'query': query, 'variables': variables})
+        status, data = await self.post_graphql(query, variables)
 
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             watching_list = data['data']['MediaListCollection']['lists'][0]['entries']
 
             embed = discord.Embed(title=f"{user}'s Watching List", color=discord.Color.blue())
@@ -108,6 +162,7 @@ class AniList(commands.Cog):
             
         self.c.execute("INSERT OR REPLACE INTO usernames (id, username) VALUES (?, ?)", (user_id, username))
         self.conn.commit()
+        self.invalidate_list_cache(user_id)
             
         await interaction.response.send_message("AniList username set successfully.")
         logger.info(f"{user_id} set username to {username}")
@@ -138,8 +193,7 @@ class AniList(commands.Cog):
         }
         '''
         user_variables = {'username': username}
-        user_response = requests.post('https://graphql.anilist.co', json={'query': user_query, 'variables': user_variables})
-        user_data = user_response.json()
+        user_status, user_data = await self.post_graphql(user_query, user_variables)
         user_id = user_data['data']['User']['id']
         await asyncio.sleep(1)
         
@@ -157,14 +211,14 @@ class AniList(commands.Cog):
         }
         '''
         list_variables = {'userId': user_id}
-        list_response = requests.post('https://graphql.anilist.co', json={'query': list_query, 'variables': list_variables})
+        list_status, list_data = await self.post_graphql(list_query, list_variables)
     
-        if list_response.status_code != 200:
-            await interaction.followup.send(f"Failed to fetch anime stats. API Response: {list_response.content}")
-            logger.error(f"Failed to fetch anime stats. API Response: {list_response.content}")
+        if list_status != 200:
+            await interaction.followup.send(f"Failed to fetch anime stats. API Response: {list_data}")
+            logger.error(f"Failed to fetch anime stats. API Response: {list_data}")
             return
         
-        data = list_response.json()
+        data = list_data
         lists = data['data']['MediaListCollection']['lists']
         watching_count = sum(1 for lst in lists for entry in lst['entries'] if entry['status'] == 'CURRENT')
         completed_count = sum(1 for lst in lists for entry in lst['entries'] if entry['status'] == 'COMPLETED')
@@ -185,14 +239,13 @@ class AniList(commands.Cog):
         }
         '''
         anime_stats_variables = {'username': username}
-        anime_stats_response = requests.post('https://graphql.anilist.co', json={'query': anime_stats_query, 'variables': anime_stats_variables})
+        anime_stats_status, anime_stats_data = await self.post_graphql(anime_stats_query, anime_stats_variables)
     
-        if anime_stats_response.status_code != 200:
+        if anime_stats_status != 200:
             await interaction.followup.send("Failed to fetch anime statistics.")
             logger.error("Failed to fetch anime statistics.")
             return
     
-        anime_stats_data = anime_stats_response.json()
         episodes = anime_stats_data['data']['User']['statistics']['anime']['episodesWatched']
         total_minutes = anime_stats_data['data']['User']['statistics']['anime']['minutesWatched']
         days = total_minutes // (24 * 60)
@@ -216,13 +269,13 @@ class AniList(commands.Cog):
         }
         '''
         manga_list_variables = {'userId': user_id}
-        manga_list_response = requests.post('https://graphql.anilist.co', json={'query': manga_list_query, 'variables': manga_list_variables})
+        manga_list_status, manga_list_data = await self.post_graphql(manga_list_query, manga_list_variables)
     
-        if manga_list_response.status_code != 200:
-            await interaction.followup.send(f"Failed to fetch manga stats. API Response: {manga_list_response.content}")
+        if manga_list_status != 200:
+            await interaction.followup.send(f"Failed to fetch manga stats. API Response: {manga_list_data}")
             return
     
-        manga_data = manga_list_response.json()
+        manga_data = manga_list_data
         manga_lists = manga_data['data']['MediaListCollection']['lists']
         manga_reading_count = sum(1 for lst in manga_lists for entry in lst['entries'] if entry['status'] == 'CURRENT')
         manga_read_count = sum(1 for lst in manga_lists for entry in lst['entries'] if entry['status'] == 'COMPLETED')
@@ -336,11 +389,10 @@ class AniList(commands.Cog):
         }
         '''
         anime_stats_variables = {'username': username}
-        anime_stats_response = requests.post('https://graphql.anilist.co', json={'query': anime_stats_query, 'variables': anime_stats_variables})
-        if anime_stats_response.status_code != 200:
+        anime_stats_status, anime_stats_data = await self.post_graphql(anime_stats_query, anime_stats_variables)
+        if anime_stats_status != 200:
             # Handle errors appropriately
             return 0
-        anime_stats_data = anime_stats_response.json()
         minutes_watched = anime_stats_data['data']['User']['statistics']['anime']['minutesWatched']
         return minutes_watched
                                                     
@@ -358,12 +410,11 @@ class AniList(commands.Cog):
         }
         '''
         manga_stats_variables = {'username': username}
-        manga_stats_response = requests.post('https://graphql.anilist.co', json={'query': manga_stats_query, 'variables': manga_stats_variables})
+        manga_stats_status, manga_stats_data = await self.post_graphql(manga_stats_query, manga_stats_variables)
     
-        if manga_stats_response.status_code != 200:
+        if manga_stats_status != 200:
             # Handle errors appropriately
             return 0
-        manga_stats_data = manga_stats_response.json()
         chapters_read = manga_stats_data['data']['User']['statistics']['manga']['chaptersRead']
         # Assuming an average of 10 minutes per chapter (this can be adjusted)
         minutes_read = chapters_read * 11
@@ -375,128 +426,186 @@ class AniList(commands.Cog):
                                    user2="The second user to compare.")
     async def compare(self, interaction: discord.Interaction, category: str, 
                       user1: discord.Member, user2: discord.Member):
-        if category not in ["all", "planned", "watched", "watching"]:
+        if category not in COMPARE_CATEGORIES:
             await interaction.response.send_message("Invalid category. Must be one of 'all', 'planned', 'watched', 'watching'.")
             return
         await interaction.response.defer()
-        list1 = await self.fetch_user_list_by_category(user1.id, category)
-        await asyncio.sleep(5)
-        list2 = await self.fetch_user_list_by_category(user2.id, category)
+        list1 = await self.get_cached_list(user1.id)
+        list2 = await self.get_cached_list(user2.id)
+        if list1 is None or list2 is None:
+            missing = user1 if list1 is None else user2
+            await interaction.followup.send(f"Could not fetch the AniList list for {missing.mention}. Have they set their username?")
+            return
 
-        # Find similarities
-        similarities = set(list1).intersection(set(list2))
+        shared = self.intersect_lists(list1, list2, COMPARE_CATEGORIES[category])
+        if not shared:
+            await interaction.followup.send("No similarities found in the specified category.")
+            return
 
-        if similarities:
-            anime_list = '\n'.join(similarities)
-            message = f"📺 Similar Animes ({category}):\n{anime_list}"
-        else:
-            message = "No similarities found in the specified category."
+        correlation = self.score_correlation(shared)
+        header = f"{len(shared)} shared anime ({category})."
+        if correlation is not None:
+            header += f"\nScore correlation: **{correlation:.2f}**"
+        lines = []
+        for media_id, status1, score1, status2, score2 in shared:
+            title = list1['titles'].get(media_id) or list2['titles'].get(media_id)
+            line = f"• {title}"
+            if category == "all":
+                line += f" ({status1.lower()} / {status2.lower()})"
+            if score1 and score2:
+                line += f" - {score1:g} / {score2:g}"
+            lines.append(line)
 
-        await interaction.followup.send(message)
-        
-    async def fetch_user_list_by_category(self, user_id, category):
-        """Fetches the user's AniList anime list by category."""
+        view = ComparePages(interaction.user.id, f"📺 {user1.display_name} vs {user2.display_name}", header, lines)
+        await interaction.followup.send(embed=view.build_embed(), view=view)
+
+    def intersect_lists(self, list1, list2, status=None):
+        """Merges two sorted media id arrays, returning (media_id, status1, score1, status2, score2) for shared entries."""
+        ids1, ids2 = list1['ids'], list2['ids']
+        shared = []
+        i = j = 0
+        while i < len(ids1) and j < len(ids2):
+            if ids1[i] < ids2[j]:
+                i += 1
+            elif ids1[i] > ids2[j]:
+                j += 1
+            else:
+                status1, status2 = list1['statuses'][i], list2['statuses'][j]
+                if status is None or (status1 == status and status2 == status):
+                    shared.append((ids1[i], status1, list1['scores'][i], status2, list2['scores'][j]))
+                i += 1
+                j += 1
+        return shared
+
+    def score_correlation(self, shared):
+        """Pearson correlation of both users' scores over shared entries they both scored."""
+        pairs = [(score1, score2) for _, _, score1, _, score2 in shared if score1 and score2]
+        if len(pairs) < 3:
+            return None
+        n = len(pairs)
+        mean1 = sum(p[0] for p in pairs) / n
+        mean2 = sum(p[1] for p in pairs) / n
+        cov = sum((a - mean1) * (b - mean2) for a, b in pairs)
+        var1 = sum((a - mean1) ** 2 for a, _ in pairs)
+        var2 = sum((b - mean2) ** 2 for _, b in pairs)
+        if not var1 or not var2:
+            return None
+        return cov / math.sqrt(var1 * var2)
+
+    def invalidate_list_cache(self, user_id):
+        self.list_cache.pop(user_id, None)
+        self.c.execute("DELETE FROM list_cache WHERE user_id=?", (user_id,))
+        self.c.execute("DELETE FROM list_cache_meta WHERE user_id=?", (user_id,))
+        self.conn.commit()
+
+    def load_cached_list(self, user_id):
+        """Builds the in-memory sorted arrays for a user from the list_cache table."""
+        self.c.execute("SELECT media_id, status, score, title FROM list_cache WHERE user_id=? ORDER BY media_id", (user_id,))
+        rows = self.c.fetchall()
+        return {
+            'ids': array('l', (row[0] for row in rows)),
+            'statuses': [row[1] for row in rows],
+            'scores': array('d', (row[2] or 0 for row in rows)),
+            'titles': {row[0]: row[3] for row in rows},
+        }
+
+    async def get_cached_list(self, user_id):
+        """Returns the user's full anime list, only hitting AniList when the cache is stale and the list changed."""
         self.c.execute("SELECT username FROM usernames WHERE id=?", (user_id,))
         result = self.c.fetchone()
-    
         if result is None:
             # User has not set their AniList username
-            return []
-    
+            return None
         username = result[0]
-    
-        # Define the GraphQL query based on the category
-        if category == "all":
-            query = '''
-            query ($username: String) {
-                MediaListCollection(userName: $username, type: ANIME) {
-                    lists {
-                        entries {
-                            media {
-                                title {
-                                    english
-                                    romaji
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-            '''
-        elif category == "planned":
-            query = '''
-            query ($username: String) {
-                MediaListCollection(userName: $username, type: ANIME, status: PLANNING) {
-                    lists {
-                        entries {
-                            media {
-                                title {
-                                    english
-                                    romaji
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-            '''
-        elif category == "watched":
-            query = '''
-            query ($username: String) {
-                MediaListCollection(userName: $username, type: ANIME, status: COMPLETED) {
-                    lists {
-                        entries {
-                            media {
-                                title {
-                                    english
-                                    romaji
-                                }
-                            }
-                        }
-                    }
+
+        self.c.execute("SELECT username, updated_at, checked_at FROM list_cache_meta WHERE user_id=?", (user_id,))
+        meta = self.c.fetchone()
+        if meta and meta[0] == username:
+            if time.time() - meta[2] < LIST_CACHE_TTL:
+                if user_id not in self.list_cache:
+                    self.list_cache[user_id] = self.load_cached_list(user_id)
+                return self.list_cache[user_id]
+
+            # Stale: one tiny query tells us whether anything changed since the cached copy
+            updated_at = await self.fetch_list_updated_at(username)
+            if updated_at is not None and updated_at == meta[1]:
+                logger.info(f"List cache for {username} revalidated.")
+                self.c.execute("UPDATE list_cache_meta SET checked_at=? WHERE user_id=?", (time.time(), user_id))
+                self.conn.commit()
+                if user_id not in self.list_cache:
+                    self.list_cache[user_id] = self.load_cached_list(user_id)
+                return self.list_cache[user_id]
+
+        entries = await self.fetch_full_list(username)
+        if entries is None:
+            return None
+        logger.info(f"List cache for {username} refreshed with {len(entries)} entries.")
+        updated_at = max((entry['updatedAt'] or 0 for entry in entries), default=0)
+        self.c.execute("DELETE FROM list_cache WHERE user_id=?", (user_id,))
+        self.c.executemany("INSERT OR REPLACE INTO list_cache (user_id, media_id, status, score, title) VALUES (?, ?, ?, ?, ?)",
+                           [(user_id, entry['mediaId'], entry['status'], entry['score'],
+                             entry['media']['title']['english'] or entry['media']['title']['romaji']) for entry in entries])
+        self.c.execute("INSERT OR REPLACE INTO list_cache_meta (user_id, username, updated_at, checked_at) VALUES (?, ?, ?, ?)",
+                       (user_id, username, updated_at, time.time()))
+        self.conn.commit()
+        self.list_cache[user_id] = self.load_cached_list(user_id)
+        return self.list_cache[user_id]
+
+    async def fetch_list_updated_at(self, username):
+        """Fetches the updatedAt of the user's most recently changed list entry."""
+        query = '''
+        query ($username: String) {
+            Page(page: 1, perPage: 1) {
+                mediaList(userName: $username, type: ANIME, sort: UPDATED_TIME_DESC) {
+                    updatedAt
                 }
             }
-            '''
-        elif category == "watching":
-            query = '''
-            query ($username: String) {
-                MediaListCollection(userName: $username, type: ANIME, status: CURRENT) {
-                    lists {
-                        entries {
-                            media {
-                                title {
-                                    english
-                                    romaji
-                                }
+        }
+        '''
+        variables = {'username': username}
+        status, data = await self.post_graphql(query, variables)
+        if status != 200:
+            return None
+        if 'errors' in data:
+            return None
+        entries = data['data']['Page']['mediaList']
+        return entries[0]['updatedAt'] if entries else 0
+
+    async def fetch_full_list(self, username):
+        """Fetches every anime list entry for the user across all statuses in one request."""
+        query = '''
+        query ($username: String) {
+            MediaListCollection(userName: $username, type: ANIME) {
+                lists {
+                    entries {
+                        mediaId
+                        status
+                        score(format: POINT_10_DECIMAL)
+                        updatedAt
+                        media {
+                            title {
+                                english
+                                romaji
                             }
                         }
                     }
                 }
             }
-            '''
-        else:
-            # Invalid category
-            return []
-    
+        }
+        '''
         variables = {'username': username}
-    
-        response = requests.post('https://graphql.anilist.co', json={'query': query, 'variables': variables})
-    
-        if response.status_code == 200:
-            data = response.json()
-            if 'errors' in data:
-                # Handle errors
-                return []
-            anime_list = []
-            for lst in data['data']['MediaListCollection']['lists']:
-                for entry in lst['entries']:
-                    media = entry['media']
-                    title = media['title']['english'] or media['title']['romaji']
-                    anime_list.append(title)
-            return anime_list
-        else:
-            # Failed to fetch anime list
-            return []
+        status, data = await self.post_graphql(query, variables)
+        if status != 200:
+            logger.error(f"Failed to fetch list for {username}. API Response: {data}")
+            return None
+        if 'errors' in data:
+            return None
+        # Custom lists repeat entries, keep one per media id
+        entries = {}
+        for lst in data['data']['MediaListCollection']['lists']:
+            for entry in lst['entries']:
+                entries[entry['mediaId']] = entry
+        return list(entries.values())
         
 async def setup(bot):
     await bot.add_cog(AniList(bot))
@@ -1,16 +1,14 @@
 from discord.ext import commands
 import os
 import asyncio
-import logging
+from services.logs import get_logger
 
-logger = logging.getLogger('DocGenerator.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/DocGenerator.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+logger = get_logger('DocGenerator.py')
 logger.info("DocGenerator Cog Loaded. Logging started...")
 
+# Reads every other cog's commands, so it has to load last
+COG_DEPENDENCIES = ['*']
+
 class DocGenerator(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -6,14 +6,9 @@ import random
 import sqlite3
 import discord
 import datetime
-import logging
+from services.logs import get_logger
 
-logger = logging.getLogger('Leveling.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/Leveling.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+logger = get_logger('Leveling.py')
 logger.info("Leveling Cog Loaded. Logging started...")
 
 VOICE_XP_RATE = 12  # Set the XP awarded for every minute in a voice channel
@@ -32,6 +27,17 @@ class Leveling(commands.Cog):
         self.cursor = self.db.cursor()
         self.cursor.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, xp REAL, total_xp REAL, level INTEGER, level_xp REAL)")
 
+    def cog_unload(self):
+        self.db.close()
+
+    def export_state(self):
+        # Voice join times live in module globals, which a reload would reset
+        return {'active_voice_users': dict(active_voice_users), 'unnotified_users': dict(unnotified_users)}
+
+    def import_state(self, state):
+        active_voice_users.update(state['active_voice_users'])
+        unnotified_users.update(state['unnotified_users'])
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         # If the member is a bot, ignore
@@ -1,20 +1,18 @@
 from discord.ext import commands
 from discord import Embed, Forbidden
 from discord.ext.commands import CheckFailure, MissingRequiredArgument
-import github
 import json
-import logging
+from services.logs import get_logger
 import sys
 import platform
 import discord
 import traceback
-import logging
+from services.lazy import lazy_import
 
-logger = logging.getLogger('CommandError.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/CommandError.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
+# PyGithub is slow to import and only needed once an error is reported
+github = lazy_import('github')
+
+logger = get_logger('CommandError.py')
 logger.info("CommandError Cog Loaded. Logging started...")
 
 def get_config():
@@ -22,14 +20,10 @@ def get_config():
         config = json.load(f)
     return config
 
-# Retrieve the private key path from the config file
-config = get_config()
-private_key_path = config.get('PRIVATE_KEY_PATH')
-
 class CommandError(commands.Cog):
-    def __init__(self, bot, private_key_path):
+    def __init__(self, bot, config):
         self.bot = bot
-        self.private_key_path = private_key_path
+        self.private_key_path = config.get('PRIVATE_KEY_PATH')
         self.github_repo = "Exohayvan/atsuko"
         self.app_id = config.get('APP_ID')
         self.installation_id = config.get('INSTALLATION_ID')
@@ -87,6 +81,4 @@ class CommandError(commands.Cog):
             logger.info(f"Unable to open an issue: {e}")
 
 async def setup(bot):
-    config = get_config()
-    private_key_path = config.get('PRIVATE_KEY_PATH')
-    await bot.add_cog(CommandError(bot, private_key_path))
\ No newline at end of file
+    await bot.add_cog(CommandError(bot, get_config()))
\ No newline at end of file
@@ -4,14 +4,11 @@ import datetime
 import sqlite3
 import asyncio
 from collections import defaultdict
-import logging
+from services.logs import get_logger
 
-logger = logging.getLogger('ChannelRelay.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/ChannelRelay.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+logger = get_logger('ChannelRelay.py')
+# The slowmode check runs every second, only keep one of its routine messages a minute
+slowmode_logger = get_logger('ChannelRelay.py.slowmode', 'ChannelRelay.py.log', sample=60)
 logger.info("ChannelRelay Cog Loaded. Logging started...")
 
 DATABASE_PATH = './data/db/channelrelays.db'
@@ -45,7 +42,23 @@ class ChannelRelay(commands.Cog):
         self.check_for_reminder.start()
 
     def cog_unload(self):
-        self.check_for_slowmode.cancel()
+        self.check_for_dynamic_slowmode.cancel()
+        self.check_for_reminder.cancel()
+
+    def export_state(self):
+        # Rate tracking only lives in memory, keep it so a reload doesn't reset slowmode and cooldowns
+        return {
+            'message_timestamps': self.message_timestamps,
+            'message_counters': self.message_counters,
+            'user_last_message_time': self.user_last_message_time,
+            'is_bot_started': self.is_bot_started,
+        }
+
+    def import_state(self, state):
+        self.message_timestamps = state['message_timestamps']
+        self.message_counters = state['message_counters']
+        self.user_last_message_time = state['user_last_message_time']
+        self.is_bot_started = state['is_bot_started']
     
     def setup_database(self):
         with sqlite3.connect(DATABASE_PATH) as conn:
@@ -119,7 +132,7 @@ class ChannelRelay(commands.Cog):
         
     @tasks.loop(seconds=1)  # Adjust time as needed
     async def check_for_dynamic_slowmode(self):
-        logger.info("Checking if slowmode is needed.")
+        slowmode_logger.info("Checking if slowmode is needed.")
         # Prune messages older than 15 minutes from all channels first
         fifteen_mins_ago = datetime.datetime.now() - datetime.timedelta(minutes=15)
         for channel_id in self.message_timestamps:
@@ -138,7 +151,7 @@ class ChannelRelay(commands.Cog):
                 if messages_per_minute == 0:
                     cooldown = 0
                 else:
-                    logger.warning("Slowmode needed. Calulating cooldown limit.")
+                    slowmode_logger.info("Slowmode needed. Calulating cooldown limit.")
                     fraction = messages_per_minute / 60  # Assuming a potential max of 60 messages per minute
                     cooldown = int(MAX_SLOWMODE * fraction**POWER)
                     cooldown = min(cooldown, MAX_SLOWMODE)  # Ensure cooldown doesn't exceed max limit
@@ -148,7 +161,7 @@ class ChannelRelay(commands.Cog):
                     try:
                         await channel.edit(slowmode_delay=cooldown)
                         emoji = ChannelRelay.get_cooldown_emoji(cooldown)
-                        logger.warning(f"Slowmode enabled and set to {cooldown}")
+                        slowmode_logger.warning(f"Slowmode enabled and set to {cooldown}")
                         await channel.send(f"{emoji} This channel's chat cooldown has been set to {cooldown} seconds due to recent message activity.")
                     except discord.Forbidden:
                         logger.warning(f"Unable to change chat slowmode for {channel}, disconnecting relay.")
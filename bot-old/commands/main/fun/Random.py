@@ -2,25 +2,119 @@ import re
 from discord.ext import commands
 import string
 import random
-import aiohttp
 import discord
-import requests
-import emoji
 import time
 import json
 import os
 import asyncio
+from array import array
+from services.logs import get_logger
+
+logger = get_logger('Random.py')
+
+REBUILD_INTERVAL = 7 * 86400  # Full re-crawl, which drops anime removed or retitled upstream since the last one
+
+class AnimeCatalogue:
+    """Local list of valid AniList anime ids with their titles and covers.
+
+    Ids live in a flat array file and the matching titles/covers in a JSON-lines
+    file in the same order, so both can be appended to as new anime show up and
+    a random pick is just a random index. Appending never notices removed or
+    retitled anime, so now and then the whole list is crawled again and
+    swapped in with replace().
+    """
+    def __init__(self, directory='./data/catalogue'):
+        self.ids_file = os.path.join(directory, 'anime_ids.bin')
+        self.meta_file = os.path.join(directory, 'anime_meta.jsonl')
+        self.rebuilt_file = os.path.join(directory, 'rebuilt_at')
+        os.makedirs(directory, exist_ok=True)
+        self.ids = array('l')
+        self.meta = []
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r', encoding='utf-8') as file:
+                self.meta = [json.loads(line) for line in file if line.strip()]
+        if os.path.exists(self.ids_file):
+            with open(self.ids_file, 'rb') as file:
+                self.ids.frombytes(file.read())
+        # An interrupted append can leave one file ahead of the other
+        if len(self.ids) != len(self.meta):
+            count = min(len(self.ids), len(self.meta))
+            del self.ids[count:]
+            del self.meta[count:]
+            self.rewrite()
+
+    def rewrite(self):
+        with open(self.meta_file, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(entry) + '\n' for entry in self.meta)
+        with open(self.ids_file, 'wb') as file:
+            self.ids.tofile(file)
+
+    def replace(self, entries):
+        """Swaps the whole catalogue for (id, english, romaji, cover) tuples sorted by id."""
+        ids = array('l', (entry[0] for entry in entries))
+        meta = [list(entry[1:]) for entry in entries]
+        with open(self.meta_file + '.tmp', 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(entry) + '\n' for entry in meta)
+        with open(self.ids_file + '.tmp', 'wb') as file:
+            ids.tofile(file)
+        # Both files are complete before either is swapped in
+        os.replace(self.meta_file + '.tmp', self.meta_file)
+        os.replace(self.ids_file + '.tmp', self.ids_file)
+        self.ids, self.meta = ids, meta
+        self.mark_rebuilt()
+
+    @property
+    def rebuilt_at(self):
+        try:
+            with open(self.rebuilt_file, 'r') as file:
+                return float(file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return 0.0
+
+    def mark_rebuilt(self):
+        with open(self.rebuilt_file, 'w') as file:
+            file.write(str(time.time()))
+
+    def append(self, entries):
+        """Appends (id, english, romaji, cover) tuples, which must have ids above last_id."""
+        if not entries:
+            return
+        new_ids = array('l', (entry[0] for entry in entries))
+        new_meta = [list(entry[1:]) for entry in entries]
+        # Meta first, so a crash leaves at most extra meta which load() trims
+        with open(self.meta_file, 'a', encoding='utf-8') as file:
+            file.writelines(json.dumps(entry) + '\n' for entry in new_meta)
+        with open(self.ids_file, 'ab') as file:
+            new_ids.tofile(file)
+        self.ids.extend(new_ids)
+        self.meta.extend(new_meta)
+
+    @property
+    def last_id(self):
+        return self.ids[-1] if self.ids else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def pick(self):
+        index = random.randrange(len(self.ids))
+        english, romaji, cover = self.meta[index]
+        return self.ids[index], english, romaji, cover
 
 class Random(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        self.http = bot.http_service
         self.total_anime_file = './data/txt/totalanilist.txt'
         self.total_anime = 0
+        self.catalogue = AnimeCatalogue()
         self.bot.loop.create_task(self.initialize_total_anime())
-        # Optionally, start a background task to update the total anime periodically
+        # Keep the local catalogue topped up with newly added anime
         self.update_interval = 86400  # 24 hours in seconds
-        self.bot.loop.create_task(self.update_total_anime_periodically())
+        self.bot.loop.create_task(self.update_catalogue_periodically())
 
     async def initialize_total_anime(self):
         # Read the total anime from a file or fetch it if the file doesn't exist
@@ -37,14 +131,18 @@ class Random(commands.Cog):
                 pageInfo {
                     total
                 }
+                media(type: ANIME) {
+                    id
+                }
             }
         }
         """
         url = 'https://graphql.anilist.co'
-        response = await self.session.post(url, json={'query': query})
-        data = await response.json()
+        async with self.http.post(url, json={'query': query}) as response:
+            status = response.status
+            data = await response.json()
 
-        if response.status == 200 and "data" in data and "Page" in data["data"]:
+        if status == 200 and "data" in data and "Page" in data["data"]:
             new_total_anime = data["data"]["Page"]["pageInfo"]["total"]
             if new_total_anime != self.total_anime:
                 self.total_anime = new_total_anime
@@ -56,15 +154,94 @@ class Random(commands.Cog):
         with open(self.total_anime_file, 'w') as file:
             file.write(str(self.total_anime))
 
-    async def update_total_anime_periodically(self):
-        # Periodically update the total anime count
+    async def update_catalogue_periodically(self):
+        # Periodically refresh the anime total and pull anime added since the last refresh into the catalogue
         while True:
-            await self.set_total_anime()
+            try:
+                await self.set_total_anime()
+            except Exception as e:
+                logger.error(f"Anime total refresh failed: {e}")
+            try:
+                if len(self.catalogue) and time.time() - self.catalogue.rebuilt_at >= REBUILD_INTERVAL:
+                    await self.rebuild_catalogue()
+                else:
+                    await self.refresh_catalogue()
+            except Exception as e:
+                logger.error(f"Anime catalogue refresh failed: {e}")
             await asyncio.sleep(self.update_interval)
 
+    async def fetch_catalogue_page(self, last_id):
+        """The first page of anime with ids above last_id, or None if AniList didn't answer."""
+        query = '''
+        query ($page: Int, $lastId: Int) {
+            Page(page: $page, perPage: 50) {
+                pageInfo {
+                    hasNextPage
+                }
+                media(type: ANIME, sort: ID, id_greater: $lastId) {
+                    id
+                    title {
+                        romaji
+                        english
+                    }
+                    coverImage {
+                        extraLarge
+                    }
+                }
+            }
+        }
+        '''
+        url = 'https://graphql.anilist.co'
+        variables = {'page': 1, 'lastId': last_id}
+        while True:
+            async with self.http.post(url, json={'query': query, 'variables': variables}) as response:
+                if response.status == 429:
+                    await asyncio.sleep(int(response.headers.get('Retry-After', 60)))
+                    continue
+                if response.status != 200:
+                    return None
+                data = await response.json()
+            page = data['data']['Page']
+            entries = [
+                (media['id'], media['title']['english'], media['title']['romaji'], media['coverImage']['extraLarge'])
+                for media in page['media']
+            ]
+            return entries, page['pageInfo']['hasNextPage'] and bool(entries)
+
+    async def refresh_catalogue(self):
+        """Pages through anime with ids above the newest one we have, appending each page as it arrives."""
+        first_crawl = not len(self.catalogue)
+        while True:
+            # Always ask for page 1 above the newest id, so an interrupted crawl resumes where it stopped
+            result = await self.fetch_catalogue_page(self.catalogue.last_id)
+            if result is None:
+                return
+            entries, has_next = result
+            self.catalogue.append(entries)
+            if not has_next:
+                break
+            await asyncio.sleep(2)  # Stay well under AniList's rate limit
+        if first_crawl:
+            self.catalogue.mark_rebuilt()
+
+    async def rebuild_catalogue(self):
+        """Crawls every anime again and swaps the result in, the old catalogue stays in use until it's complete."""
+        entries = []
+        while True:
+            result = await self.fetch_catalogue_page(entries[-1][0] if entries else 0)
+            if result is None:
+                return  # Try again next cycle
+            page, has_next = result
+            entries.extend(page)
+            if not has_next:
+                break
+            await asyncio.sleep(2)
+        await asyncio.to_thread(self.catalogue.replace, entries)
+        logger.info(f"Anime catalogue rebuilt with {len(entries)} anime")
+
     async def fetch(self, url):
         try:
-            async with self.session.get(url) as response:
+            async with self.http.get(url) as response:
                 return await response.text()
         except Exception:
             return None
@@ -151,11 +328,13 @@ class Random(commands.Cog):
     @random.command()
     async def saying(self, ctx):
         """Returns a random saying."""
-        response = requests.get("https://api.quotable.io/random")
+        async with self.http.get("https://api.quotable.io/random") as response:
+            status = response.status
+            body = await response.text()
     
-        if response.status_code == 200:
+        if status == 200:
             try:
-                data = response.json()
+                data = json.loads(body)
                 quote = data['content']
                 author = data['author']
 
@@ -186,54 +365,62 @@ class Random(commands.Cog):
     @random.command()
     async def anime(self, ctx):
         """Returns a random anime."""
-        # Use the self.total_anime value to get a random anime id
+        if len(self.catalogue):
+            anime_id, english_title, romaji_title, cover = self.catalogue.pick()
+            await ctx.send(embed=self.anime_embed(anime_id, english_title, romaji_title, cover))
+            return
+
+        # Catalogue not built yet, fetch just the one anime we land on
         if self.total_anime == 0:
             await ctx.send("Sorry, I couldn't fetch the total number of anime.")
             return
     
-        id = random.randint(1, self.total_anime)
-    
         query = '''
-        query ($id: Int) {
-            Media (id: $id, type: ANIME) {
-                id
-                title {
-                    romaji
-                    english
-                }
-                description (asHtml: false)
-                coverImage {
-                    extraLarge
+        query ($page: Int) {
+            Page(page: $page, perPage: 1) {
+                media(type: ANIME) {
+                    id
+                    title {
+                        romaji
+                        english
+                    }
+                    coverImage {
+                        extraLarge
+                    }
                 }
             }
         }
         '''
     
         variables = {
-            'id': id
+            'page': random.randint(1, self.total_anime)
         }
         url = 'https://graphql.anilist.co'
     
-        response = await self.session.post(url, json={'query': query, 'variables': variables})
-        data = await response.json()
+        async with self.http.post(url, json={'query': query, 'variables': variables}) as response:
+            status = response.status
+            data = await response.json()
     
-        if response.status == 200:
-            if "data" in data and "Media" in data["data"]:
-                anime = data["data"]["Media"]
-                
-                # Check if English or Romaji titles are None and set a default value
-                english_title = anime['title']['english'] if anime['title']['english'] else "Not Found"
-                romaji_title = anime['title']['romaji'] if anime['title']['romaji'] else "Not Found"
-            
-                title = f"English: {english_title} | Romaji: {romaji_title}"
-                embed = discord.Embed(title=title, description=anime["description"])
-                embed.set_footer(text="This is a randomly generated anime. Please watch at your own risk.")
-                embed.set_thumbnail(url=anime["coverImage"]["extraLarge"])
-                await ctx.send(embed=embed)
+        if status == 200:
+            if "data" in data and data["data"]["Page"]["media"]:
+                anime = data["data"]["Page"]["media"][0]
+                await ctx.send(embed=self.anime_embed(anime['id'], anime['title']['english'], anime['title']['romaji'], anime["coverImage"]["extraLarge"]))
             else:
                 await ctx.send("Sorry, the Anilist API did not return a valid anime.")
         else:
             await ctx.send("Sorry, I couldn't fetch an anime right now.")
+
+    def anime_embed(self, anime_id, english_title, romaji_title, cover):
+        # Check if English or Romaji titles are None and set a default value
+        english_title = english_title if english_title else "Not Found"
+        romaji_title = romaji_title if romaji_title else "Not Found"
+
+        title = f"English: {english_title} | Romaji: {romaji_title}"
+        embed = discord.Embed(title=title, url=f"https://anilist.co/anime/{anime_id}")
+        embed.set_footer(text="This is a randomly generated anime. Please watch at your own risk.")
+        if cover:
+            embed.set_thumbnail(url=cover)
+        return embed
                         
 async def setup(bot):
     await bot.add_cog(Random(bot))
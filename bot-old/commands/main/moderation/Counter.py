@@ -1,117 +1,202 @@
 import discord
 from discord.ext import commands, tasks
 import sqlite3
-import logging
-
-logger = logging.getLogger('Counter.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/Counter.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+import asyncio
+import time
+from collections import deque
+from services.logs import get_logger
+
+logger = get_logger('Counter.py')
 logger.info("Counter Cog Loaded. Logging started...")
 
+COUNTER_TYPES = ["Total members", "Online members", "Bots"]
+
+RENAME_LIMIT = 2  # Discord allows 2 renames per channel...
+RENAME_PERIOD = 600  # ...per 10 minutes
+
+class RenameWindow:
+    """The last RENAME_LIMIT rename times of a channel; another rename is allowed once the oldest is RENAME_PERIOD old."""
+    def __init__(self):
+        self.times = deque(maxlen=RENAME_LIMIT)
+
+    def take(self):
+        now = time.monotonic()
+        if len(self.times) == RENAME_LIMIT and now - self.times[0] < RENAME_PERIOD:
+            return False
+        self.times.append(now)
+        return True
+
+class GuildCounts:
+    def __init__(self, guild):
+        self.total = len(guild.members)
+        self.online = sum(1 for member in guild.members if member.status != discord.Status.offline)
+        self.bots = sum(1 for member in guild.members if member.bot)
+
+    def value(self, counter_type):
+        return {"Total members": self.total, "Online members": self.online, "Bots": self.bots}[counter_type]
+
 class Counter(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db_path = './data/db/counter.db'
+        self.channels = {}  # guild_id: set of counter channel ids
+        self.counts = {}  # guild_id: GuildCounts, only for guilds with counters
+        self.renames = {}  # channel_id: RenameWindow
+        self.dirty = set()  # guild ids whose counters may show an old value
+        self.load_channels()
         self.update_counters.start()
 
     def cog_unload(self):
         self.update_counters.cancel()
 
-    @tasks.loop(minutes=2)
-    async def update_counters(self):
-        logger.info("Updating counters")
-        guilds = self.bot.guilds
-        conn = sqlite3.connect('./data/db/counter.db')
+    def load_channels(self):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute('CREATE TABLE IF NOT EXISTS Counter (guild_id int, channel_id int)')
+        c.execute('SELECT guild_id, channel_id FROM Counter')
+        for guild_id, channel_id in c.fetchall():
+            self.channels.setdefault(guild_id, set()).add(channel_id)
+        conn.commit()
+        conn.close()
+        self.dirty.update(self.channels)
+
+    def add_channel(self, guild_id, channel_id):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute('INSERT INTO Counter (guild_id, channel_id) VALUES (?, ?)', (guild_id, channel_id))
+        conn.commit()
+        conn.close()
+        self.channels.setdefault(guild_id, set()).add(channel_id)
+        self.dirty.add(guild_id)
+
+    def remove_channel(self, guild_id, channel_id):
+        conn = sqlite3.connect(self.db_path)
         c = conn.cursor()
-    
-        for guild in guilds:
-            logger.info(f"Processing guild: {guild.id}")
-            c.execute('SELECT channel_id FROM Counter WHERE guild_id = ?', (guild.id,))
-            channel_ids = c.fetchall()
-    
-            for channel_id in channel_ids:
-                logger.info(f"Found channel ID in DB: {channel_id[0]}")
-                channel = self.bot.get_channel(channel_id[0])
-                if channel:
-                    logger.info(f"Channel found: {channel.id}")
-                    await self.update_counter(channel)
-                else:
-                    logger.info(f"Channel ID {channel_id[0]} not found, removing from DB")
-                    # Delete the channel from the database if it can't be found
-                    c.execute('DELETE FROM Counter WHERE channel_id = ?', (channel_id[0],))
-    
+        c.execute('DELETE FROM Counter WHERE channel_id = ?', (channel_id,))
         conn.commit()
         conn.close()
+        self.channels.get(guild_id, set()).discard(channel_id)
+        self.renames.pop(channel_id, None)
+
+    def guild_counts(self, guild):
+        # Counted once, then kept current by the member and presence events below
+        if guild.id not in self.counts:
+            self.counts[guild.id] = GuildCounts(guild)
+        return self.counts[guild.id]
+
+    def adjust(self, member, sign):
+        counts = self.counts.get(member.guild.id)
+        if counts is None:
+            return
+        counts.total += sign
+        if member.bot:
+            counts.bots += sign
+        if member.status != discord.Status.offline:
+            counts.online += sign
+        self.dirty.add(member.guild.id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Recount after a reconnect, events may have been missed
+        self.counts.clear()
+        self.dirty.update(self.channels)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.adjust(member, 1)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.adjust(member, -1)
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before, after):
+        counts = self.counts.get(after.guild.id)
+        if counts is None:
+            return
+        was_online = before.status != discord.Status.offline
+        is_online = after.status != discord.Status.offline
+        if was_online != is_online:
+            counts.online += 1 if is_online else -1
+            self.dirty.add(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.counts.pop(guild.id, None)
+        self.dirty.discard(guild.id)
+
+    @tasks.loop(seconds=30)
+    async def update_counters(self):
+        # Only guilds whose counts changed, all at once; renames are throttled per channel
+        dirty, self.dirty = self.dirty, set()
+        guilds = [guild for guild in map(self.bot.get_guild, dirty) if guild is not None]
+        if guilds:
+            logger.info(f"Updating counters in {len(guilds)} guilds")
+            await asyncio.gather(*(self.update_guild(guild) for guild in guilds))
+
+    @update_counters.before_loop
+    async def before_update_counters(self):
+        await self.bot.wait_until_ready()
+
+    async def update_guild(self, guild):
+        for channel_id in list(self.channels.get(guild.id, ())):
+            channel = guild.get_channel(channel_id)
+            if channel:
+                if not await self.update_counter(channel):
+                    self.dirty.add(guild.id)  # Out of renames, try again on a later pass
+            else:
+                logger.info(f"Channel ID {channel_id} not found, removing from DB")
+                # Delete the channel from the database if it can't be found
+                await asyncio.to_thread(self.remove_channel, guild.id, channel_id)
 
     async def update_counter(self, channel):
+        """Renames the channel if its number is out of date. Returns False if it had to wait for the rate limit."""
         try:
             guild = channel.guild
-            name = channel.name
-            logger.info(f"Updating counter for channel: {channel.id} in guild: {guild.id}")  # Log channel and guild
-
-            if "Total members" in name:
-                count = len(guild.members)
-                new_name = f"Total members: {count}"
-            elif "Online members" in name:
-                count = len([member for member in guild.members if member.status != discord.Status.offline])
-                new_name = f"Online members: {count}"
-            elif "Bots" in name:
-                count = len([member for member in guild.members if member.bot])
-                new_name = f"Bots: {count}"
-            else:
-                logger.info("No matching counter type found.")  # Log if no match
-                return  # If none of the keywords match, do nothing
-
-            if channel.name != new_name:  # Only update if the name has changed
-                await channel.edit(name=new_name)
-                logger.info(f"Updated channel: {channel.id} to {new_name}")
-            else:
-                logger.info(f"No update needed for channel: {channel.id}")
+            counter_type = next((name for name in COUNTER_TYPES if name in channel.name), None)
+            if counter_type is None:
+                return True  # If none of the keywords match, do nothing
+            new_name = f"{counter_type}: {self.guild_counts(guild).value(counter_type)}"
 
+            if channel.name == new_name:  # Only update if the name has changed
+                return True
+            if not self.renames.setdefault(channel.id, RenameWindow()).take():
+                return False
+            await channel.edit(name=new_name)
+            logger.info(f"Updated channel: {channel.id} in guild: {guild.id} to {new_name}")
         except Exception as e:
             logger.info(f"Error updating channel: {e}")  # Exception handling
-            
+        return True
+
     @commands.command()
     async def create_counter(self, ctx, *, name):
         """Creates a new counter voice channel with the given name. Counter types: Total members, Online members, Bots."""
-        if name not in ["Total members", "Online members", "Bots"]:
+        if name not in COUNTER_TYPES:
             await ctx.send("Invalid counter name. Must be one of 'Total members', 'Online members', 'Bots'.")
             return
 
         channel = await ctx.guild.create_voice_channel(name + ": 0", category=ctx.channel.category)
-        
-        # Store the channel in the database
-        conn = sqlite3.connect('./data/db/counter.db')
-        c = conn.cursor()
-        c.execute('CREATE TABLE IF NOT EXISTS Counter (guild_id int, channel_id int)')
-        c.execute('INSERT INTO Counter VALUES (?, ?)', (ctx.guild.id, channel.id))
-        conn.commit()
-        conn.close()
 
+        # Store the channel in the database
+        self.add_channel(ctx.guild.id, channel.id)
         await self.update_counter(channel)
 
     @commands.command(name='channel_reconnect')
     async def channel_reconnect(self, ctx, channel: discord.VoiceChannel):
         """Reconnects a voice channel to the counter system and adds it back to the database."""
-        # Check if the channel is already in the database
-        conn = sqlite3.connect('./data/db/counter.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM Counter WHERE channel_id = ?', (channel.id,))
-        if c.fetchone():
+        # Check if the channel is already connected
+        if channel.id in self.channels.get(ctx.guild.id, ()):
             await ctx.send("This channel is already connected.")
         else:
             # Add the channel back to the database
-            c.execute('INSERT INTO Counter (guild_id, channel_id) VALUES (?, ?)', (ctx.guild.id, channel.id))
-            conn.commit()
-            conn.close()
+            self.add_channel(ctx.guild.id, channel.id)
             await ctx.send(f"Channel {channel.name} has been reconnected to the counter system.")
             await self.update_counter(channel)  # Optionally update the counter immediately
-        
+
     # Manual command to trigger counter update
     @commands.command(name='channelupdate')
     async def channel_update(self, ctx):
+        self.dirty.update(self.channels)
         await self.update_counters()
 
 async def setup(bot):
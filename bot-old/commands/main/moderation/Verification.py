@@ -4,14 +4,9 @@ import sqlite3
 import random
 from datetime import datetime, timedelta
 from discord.ext.commands import MissingRequiredArgument
-import logging
+from services.logs import get_logger
 
-logger = logging.getLogger('Verification.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/Verification.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+logger = get_logger('Verification.py')
 logger.info("Verification Cog Loaded. Logging started...")
 
 class Verification(commands.Cog):
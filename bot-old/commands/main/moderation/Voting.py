@@ -5,14 +5,9 @@ import datetime
 import sqlite3
 import json
 from discord.errors import NotFound
-import logging
-
-logger = logging.getLogger('Voting.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/Voting.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+from services.logs import get_logger
+
+logger = get_logger('Voting.py')
 logger.info("Voting Cog Loaded. Logging started...")
 
 class Voting(commands.Cog):
@@ -36,13 +31,26 @@ class Voting(commands.Cog):
         self.active_votes = {}
         self.running_votes = {}  # Store active voting tasks
 
-        # Schedule the load_votes() coroutine to run as soon as possible
-        self.bot.loop.create_task(self.load_votes())
+        # Load votes from the database and resume voting countdowns once the bot is ready
+        self.load_votes_task = self.bot.loop.create_task(self.load_votes())
         self.check_votes_task = self.bot.loop.create_task(self.check_votes_periodically())
         
     def cog_unload(self):
+        self.load_votes_task.cancel()
         self.check_votes_task.cancel()
+        for task in self.running_votes.values():
+            task.cancel()
         self.conn.close()
+
+    def export_state(self):
+        return {'active_votes': self.active_votes}
+
+    def import_state(self, state):
+        # Votes handed over from the previous instance don't need to be reloaded and recounted
+        for title, vote_data in state['active_votes'].items():
+            if title not in self.running_votes:
+                self.active_votes[title] = vote_data
+                self.running_votes[title] = self.bot.loop.create_task(self.resume_vote(title))
         
     async def check_votes_periodically(self):
         await self.bot.wait_until_ready()  # Wait until the bot is ready
@@ -85,10 +93,13 @@ class Voting(commands.Cog):
         await channel.send(embed=winner_embed)
     
     async def load_votes(self):
+        await self.bot.wait_until_ready()
         logger.info("Loading votes.")
         self.cursor.execute("SELECT * FROM active_votes")
         for row in self.cursor.fetchall():
             title, message_id, channel_id, option_emojis, votes, start_time, duration, user_votes = row
+            if title in self.running_votes:
+                continue  # Already running, e.g. handed over by a reload
             self.active_votes[title] = {
                 'message_id': message_id,
                 'channel_id': channel_id,
@@ -159,12 +170,6 @@ class Voting(commands.Cog):
         await self.recount_votes(title)
         self.running_votes[title] = self.bot.loop.create_task(self.resume_vote(title))
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        # When the bot starts/restarts, load votes from the database and resume voting countdown
-        logger.info("Loading databases and resuming voting.")
-        await self.load_votes()
-        
     @commands.Cog.listener()
     async def on_reaction_add(self, reaction, user):
         if user == self.bot.user:
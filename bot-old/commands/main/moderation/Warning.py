@@ -1,14 +1,9 @@
 from discord.ext import commands
 import discord
-import logging
+from services.logs import get_logger
 
 # Setup logging as before
-logger = logging.getLogger('WarningCog.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/WarningCog.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+logger = get_logger('WarningCog.py', 'WarningCog.log')
 
 class WarningCog(commands.Cog):
     def __init__(self, bot):
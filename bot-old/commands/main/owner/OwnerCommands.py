@@ -4,7 +4,11 @@ import os
 import subprocess
 import sys
 import json
-from github import Github
+import io
+from services.tree_sync import sync_tree_if_changed
+from services.hot_reload import reload_with_state
+from services.logs import pipeline
+from services.git import git_repo, GitError
 
 RESTART_EXIT_CODE = 42
 
@@ -36,6 +40,22 @@ class OwnerCommands(commands.Cog):
         except Exception as e:
             await ctx.send(f'Error while unloading cog {cog_path}: {str(e)}')
                 
+    @commands.command(hidden=True)
+    async def reload_cog(self, ctx, *, cog_path: str):
+        # Check if the user has the correct ID
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        # Reloads in place with the cog's state handed over, no restart or gateway reconnect
+        try:
+            await reload_with_state(self.bot, f"commands.{cog_path}")
+            await ctx.send(f'Successfully reloaded cog {cog_path}')
+        except commands.ExtensionNotFound:
+            await ctx.send(f'Cog {cog_path} not found')
+        except Exception as e:
+            await ctx.send(f'Error while reloading cog {cog_path}: {str(e)}')
+
     @commands.command(hidden=True)
     async def execute(self, ctx, *, command):
         # Check if the user has the correct ID
@@ -57,6 +77,127 @@ class OwnerCommands(commands.Cog):
         if not output and not error:
             await ctx.send("The command executed successfully with no output.")
 
+    @commands.command(hidden=True)
+    async def httpstats(self, ctx):
+        # Check if the user has the correct ID
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        report = self.bot.http_service.report()
+        if not report:
+            await ctx.send("No HTTP requests made yet.")
+            return
+
+        embed = discord.Embed(title="HTTP Service", color=discord.Color.blue())
+        for host, stats in sorted(report.items()):
+            embed.add_field(
+                name=host,
+                value=f"{stats['requests']} requests, {stats['errors']} errors\navg {stats['avg_ms']:.0f}ms, max {stats['max_ms']:.0f}ms",
+                inline=False,
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True)
+    async def commandstats(self, ctx, count: int = 15):
+        # Check if the user has the correct ID
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        metrics = self.bot.metrics
+        busiest = sorted(metrics.commands.items(), key=lambda item: item[1].latency.count, reverse=True)[:count]
+        embed = discord.Embed(title="Command Metrics", description=f"Event loop lag: last {metrics.last_lag * 1000:.0f}ms, max {metrics.max_lag * 1000:.0f}ms", color=discord.Color.blue())
+        embed.add_field(
+            name="Busiest commands",
+            value="\n".join(
+                f"`{command}` ({kind}) {stats.latency.count} runs, p50 ≤{stats.latency.quantile(0.5) * 1000:.0f}ms, p95 ≤{stats.latency.quantile(0.95) * 1000:.0f}ms, {stats.errors} errors, max {stats.max_in_flight} at once"
+                for (cog, command, kind), stats in busiest
+            )[:1024] or "None",
+            inline=False,
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True)
+    async def logstats(self, ctx):
+        # Check if the user has the correct ID
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        stats = pipeline.stats
+        await ctx.send(
+            f"Log pipeline: {len(pipeline.files)} files, {pipeline.queue.qsize()}/{pipeline.queue.maxsize} queued\n"
+            f"Written: {stats['written']} in {stats['batches']} batches, {stats['flushes']} flushes\n"
+            f"Dropped (queue full): {stats['dropped']} | Suppressed (sampled/rate limited): {stats['suppressed']}"
+        )
+
+    @commands.command(hidden=True)
+    async def loadreport(self, ctx):
+        # Check if the user has the correct ID
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        report = self.bot.cog_load_report
+        if report is None:
+            await ctx.send("Cogs have not finished loading yet.")
+            return
+
+        cogs = report['cogs']
+        slowest = sorted(cogs, key=lambda module: cogs[module]['import_ms'] + cogs[module]['setup_ms'], reverse=True)[:10]
+        embed = discord.Embed(title="Cog Load Report", description=f"{report['loaded']}/{len(cogs)} cogs loaded in {report['elapsed_ms']:.0f}ms", color=discord.Color.blue())
+        embed.add_field(
+            name="Slowest",
+            value="\n".join(f"`{module}` imports {cogs[module]['import_ms']:.0f}ms, setup {cogs[module]['setup_ms']:.0f}ms" for module in slowest) or "None",
+            inline=False,
+        )
+        for module in report['failed'][:20]:
+            embed.add_field(name=f"{cogs[module]['status'].capitalize()}: {module}", value=(cogs[module]['error'] or "Unknown error")[:1024], inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True)
+    async def importaudit(self, ctx, count: int = 10):
+        # Check if the user has the correct ID
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        report = self.bot.cog_load_report
+        if report is None:
+            await ctx.send("Cogs have not finished loading yet.")
+            return
+
+        audit = report['imports']
+        by_cog = sorted(audit.by_cog().items(), key=lambda item: item[1], reverse=True)[:count]
+        total_ms = sum(record[2] for record in audit.records if record[3] == 0) / 1000
+        rss = f", peak RSS {report['max_rss_kb'] / 1024:.0f}MB" if report['max_rss_kb'] else ""
+        embed = discord.Embed(title="Import Audit", description=f"{len(audit.records)} modules imported during cog load, {total_ms:.0f}ms{rss}", color=discord.Color.blue())
+        embed.add_field(
+            name="By cog",
+            value="\n".join(f"`{cog or 'unattributed'}` {us / 1000:.0f}ms" for cog, us in by_cog)[:1024] or "None",
+            inline=False,
+        )
+        embed.add_field(
+            name="Slowest modules (self time)",
+            value="\n".join(f"`{name}` {self_us / 1000:.1f}ms ({cog or '-'})" for name, self_us, cumulative_us, depth, cog in audit.slowest(count))[:1024] or "None",
+            inline=False,
+        )
+        # The full -X importtime style listing is too long for an embed
+        listing = discord.File(io.BytesIO(audit.format().encode('utf-8')), filename="importtime.txt")
+        await ctx.send(embed=embed, file=listing)
+
+    @commands.command(hidden=True)
+    async def synctree(self, ctx):
+        # Check if the user has the correct ID
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        # Startup only syncs when the tree changed, this forces it (e.g. after syncing from elsewhere)
+        await sync_tree_if_changed(self.bot.tree, force=True)
+        await ctx.send("Slash commands synced.")
+
     @commands.command(hidden=True)
     async def tree(self, ctx):
         # Check if the user has the correct ID
@@ -149,16 +290,18 @@ class OwnerCommands(commands.Cog):
             await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
             return
         await interaction.response.defer()
-        # Perform the git pull operation
-        result = subprocess.run(["git", "pull"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output = result.stdout.decode("utf-8")
-        error = result.stderr.decode("utf-8")
+        # Perform the git pull operation, off the event loop
+        try:
+            returncode, output, error = await git_repo().pull()
+        except GitError as e:
+            await interaction.followup.send(f'Update failed with error: {e}', ephemeral=True)
+            return
 
         if "Already up to date." in output:
             await interaction.followup.send('Already up to date.', ephemeral=True)
             return
 
-        if result.returncode != 0:
+        if returncode != 0:
             await interaction.followup.send(f'Update failed with error: {error}', ephemeral=True)
         else:
             await interaction.followup.send(f'Update successful: {output}', ephemeral=True)
@@ -1,42 +1,251 @@
 from discord.ext import commands
 import discord
 import os
-import shutil
-import logging
-
-logger = logging.getLogger('PullLog')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/PullLog.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+import io
+import re
+import gzip
+import json
+import mmap
+import asyncio
+import zipfile
+import datetime
+from services.logs import get_logger
+
+logger = get_logger('PullLog', 'PullLog.py.log')
 logger.info("PullLog Cog Loaded. Logging started...")
 
+DEFAULT_UPLOAD_LIMIT = 10 * 1024 * 1024  # Discord's limit outside boosted guilds
+FILES_PER_MESSAGE = 10
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+TEXT_TIMESTAMP = '%Y-%m-%d %H:%M:%S,%f'
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+def parse_time(value):
+    """'10m', '2h', '1d' ago, or an ISO date/time. Returns an aware datetime."""
+    match = re.fullmatch(r'(\d+)([smhd])', value)
+    if match:
+        seconds = int(match.group(1)) * DURATION_UNITS[match.group(2)]
+        return datetime.datetime.now().astimezone() - datetime.timedelta(seconds=seconds)
+    moment = datetime.datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.astimezone()
+
+def parse_head(line):
+    """Returns (timestamp, level, logger) for the first line of a record, None for a continuation line."""
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            return datetime.datetime.fromisoformat(entry['ts']), entry['level'], entry['logger']
+        except (ValueError, KeyError):
+            return None
+    try:
+        timestamp = datetime.datetime.strptime(line[:23], TEXT_TIMESTAMP).astimezone()
+        level, name, _ = line[24:].split(':', 2)
+    except ValueError:
+        return None
+    return timestamp, level, name
+
+def reverse_lines(path):
+    """Yields the lines of a file from the last to the first, without reading the rest of it."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            if mm[end - 1:end] == b'\n':
+                end -= 1
+            while end > 0:
+                start = mm.rfind(b'\n', 0, end) + 1
+                yield mm[start:end].decode('utf-8', errors='replace')
+                end = start - 1
+
+def reverse_records(path):
+    """Yields (timestamp, level, logger, text) newest first, keeping tracebacks with their record."""
+    continuation = []
+    for line in reverse_lines(path):
+        head = parse_head(line)
+        if head is None:
+            continuation.append(line)
+            continue
+        yield (*head, "\n".join([line, *reversed(continuation)]))
+        continuation = []
+
+class LogFilter:
+    """The key=value filters of pulllog: since, until, level, logger and trace."""
+    def __init__(self, since=None, until=None, level=None, logger=None, trace=None):
+        self.since = since
+        self.until = until
+        if level and level.upper() not in LEVELS:
+            raise ValueError(f"Unknown level {level}")
+        self.level = LEVELS[level.upper()] if level else None
+        self.logger = logger.lower() if logger else None
+        self.trace = trace
+
+    def matches(self, timestamp, level, name, text):
+        if self.until and timestamp > self.until:
+            return False
+        if self.level is not None and LEVELS.get(level, 0) < self.level:
+            return False
+        if self.logger and name.lower() != self.logger:
+            return False
+        if self.trace and f"[trace={self.trace}]" not in text and f'"trace": "{self.trace}"' not in text:
+            return False
+        return True
+
+def collect(log_directory, log_filter, filename=None):
+    """Reads matching records from every log file (or one), merged oldest first.
+
+    Files are read from the end and each stops at the first record older than
+    `since`, so asking for the last few minutes never reads the whole file.
+    """
+    names = [filename] if filename else sorted(os.listdir(log_directory))
+    records = []
+    for name in names:
+        path = os.path.join(log_directory, name)
+        if not os.path.isfile(path):
+            continue
+        for timestamp, level, logger_name, text in reverse_records(path):
+            if log_filter.since and timestamp < log_filter.since:
+                break
+            if log_filter.matches(timestamp, level, logger_name, text):
+                records.append((timestamp, name, text))
+    records.sort(key=lambda record: record[0])
+    return "".join(f"{name}: {text}\n" for timestamp, name, text in records)
+
+def read_file(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+def split_lines(data, count):
+    """Splits bytes into about `count` pieces, each ending on a line boundary."""
+    pieces = []
+    size = len(data) // count + 1
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start + size)
+        end = len(data) if end == -1 else end + 1
+        pieces.append(data[start:end])
+        start = end
+    return pieces
+
+def gzip_chunks(text, basename, limit):
+    """Gzips text into files under limit bytes each, split on line boundaries so each part opens on its own."""
+    data = text.encode('utf-8')
+    compressed = gzip.compress(data)
+    if len(compressed) <= limit:
+        return [(f"{basename}.gz", compressed)]
+    # Guess the number of parts from the overall ratio, then halve any part that still doesn't fit
+    pending = split_lines(data, -(-len(compressed) * 11 // (limit * 10)))
+    parts = []
+    while pending:
+        piece = pending.pop(0)
+        compressed = gzip.compress(piece)
+        if len(compressed) <= limit or piece.count(b'\n') < 2:
+            parts.append(compressed)
+        else:
+            pending[:0] = split_lines(piece, 2)
+    return [(f"{basename}.part{i}.gz", part) for i, part in enumerate(parts, 1)]
+
+def zip_directory(log_directory, limit):
+    """Zips the whole log directory in memory, split into numbered pieces when it is over the limit."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in sorted(os.listdir(log_directory)):
+            path = os.path.join(log_directory, name)
+            if os.path.isfile(path):
+                archive.write(path, name)
+    data = buffer.getvalue()
+    if len(data) <= limit:
+        return [("logs_backup.zip", data)]
+    # Rejoin with: cat logs_backup.zip.* > logs_backup.zip
+    return [(f"logs_backup.zip.{i:03}", data[offset:offset + limit]) for i, offset in enumerate(range(0, len(data), limit), 1)]
+
 class PullLog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.log_directory = './logs'
-    
-    @commands.command(usage="pulllog <filename>")
-    async def pulllog(self, ctx, log_filename: str = None):
-        """Send a log file or the entire log directory if no file is specified."""
-        if log_filename:
-            # Send specific log file
-            file_path = os.path.join(self.log_directory, log_filename)
-            file_path = f'{file_path}.log'
-            if os.path.exists(file_path):
-                await ctx.send(file=discord.File(file_path))
-                logger.info(f"Sent log file: {log_filename}")
+
+    def log_file(self, name):
+        """The file name inside the log directory that name refers to, or None if it points anywhere else."""
+        if not name or name in ('.', '..') or os.path.basename(name) != name or os.path.isabs(name):
+            return None
+        log_directory = os.path.realpath(self.log_directory)
+        for candidate in (name, f'{name}.log'):
+            path = os.path.realpath(os.path.join(log_directory, candidate))
+            # realpath also resolves symlinks that lead out of the directory
+            if os.path.dirname(path) == log_directory and os.path.isfile(path):
+                return candidate
+        return None
+
+    async def send_files(self, ctx, files):
+        for i in range(0, len(files), FILES_PER_MESSAGE):
+            batch = files[i:i + FILES_PER_MESSAGE]
+            await ctx.send(files=[discord.File(io.BytesIO(data), filename=name) for name, data in batch])
+
+    @commands.command(usage="pulllog [filename] [since=10m] [until=<time>] [level=error] [logger=<name>] [trace=<id>]")
+    async def pulllog(self, ctx, *args):
+        """Send log lines matching the filters, a log file, or the entire log directory if nothing is specified.
+
+        since/until take a duration like 10m, 2h, 1d or an ISO date. level keeps that level and above.
+        """
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        filename = None
+        filters = {}
+        for arg in args:
+            key, sep, value = arg.partition('=')
+            if sep and key in ('since', 'until', 'level', 'logger', 'trace'):
+                filters[key] = value
+            elif not sep and filename is None:
+                filename = self.log_file(arg)
+                if filename is None:
+                    await ctx.send("Log file not found.")
+                    logger.error(f"Log file not found: {arg}")
+                    return
             else:
-                await ctx.send("Log file not found.")
-                logger.error(f"Log file not found: {log_filename}")
-        else:
-            # Compress and send the entire log directory
+                await ctx.send(f"Unknown argument `{arg}`. Usage: `{ctx.prefix}{self.pulllog.usage}`")
+                return
+
+        limit = ctx.guild.filesize_limit if ctx.guild else DEFAULT_UPLOAD_LIMIT
+        limit -= 64 * 1024  # Room for the multipart overhead
+
+        if not filename and not filters:
             logger.info("Making log archive.")
-            archive_path = shutil.make_archive("logs_backup", 'zip', self.log_directory)
-            await ctx.send(file=discord.File(archive_path))
-            logger.info("Sent compressed log directory.")
-            os.remove(archive_path)  # Clean up the archive file after sending
+            files = await asyncio.to_thread(zip_directory, self.log_directory, limit)
+            await self.send_files(ctx, files)
+            if len(files) > 1:
+                await ctx.send(f"Archive split in {len(files)} pieces, rejoin with `cat logs_backup.zip.* > logs_backup.zip`.")
+            logger.info(f"Sent compressed log directory in {len(files)} pieces.")
+            return
+
+        if filters:
+            try:
+                for key in ('since', 'until'):
+                    if key in filters:
+                        filters[key] = parse_time(filters[key])
+                log_filter = LogFilter(**filters)
+            except ValueError as e:
+                await ctx.send(f"Invalid filter: {e}")
+                return
+            text = await asyncio.to_thread(collect, self.log_directory, log_filter, filename)
+        else:
+            text = await asyncio.to_thread(read_file, os.path.join(self.log_directory, filename))
+        if not text:
+            await ctx.send("No log lines match.")
+            return
+        if 'trace' in filters:
+            basename = f"trace-{filters['trace']}"
+        else:
+            basename = filename.replace('.log', '') if filename else "logs"
+        data = text.encode('utf-8')
+        if len(data) <= limit and len(data) < 1024 * 1024:
+            files = [(f"{basename}.log", data)]  # Small enough to read in Discord without unpacking
+        else:
+            files = await asyncio.to_thread(gzip_chunks, text, f"{basename}.log", limit)
+        await self.send_files(ctx, files)
+        line_count = text.count('\n')
+        logger.info(f"Sent {line_count} log lines in {len(files)} files for {' '.join(args)}")
 
 async def setup(bot):
     await bot.add_cog(PullLog(bot))
@@ -5,7 +5,9 @@ import datetime
 import os
 import shutil
 import math
-import subprocess
+from services.git import git_repo, GitError
+import sqlite3
+import asyncio
 
 def get_directory_size(path='.'):
     total = 0
@@ -30,6 +32,22 @@ def get_available_space(path='.'):
     total, used, free = shutil.disk_usage(path)
     return convert_size(free)
 
+def get_loop_lag_summary(db_path='./data/db/latency.db', hours=24):
+    """Worst event loop lag, stall count and biggest offender over the last hours, from LatencyCog's DB."""
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+    try:
+        with sqlite3.connect(db_path) as conn:
+            max_lag, = conn.execute("SELECT MAX(max_lag) FROM loop_lag WHERE timestamp >= ?", (since,)).fetchone()
+            stalls, worst = conn.execute("SELECT COUNT(*), MAX(duration) FROM loop_stalls WHERE timestamp >= ?", (since,)).fetchone()
+            offender = conn.execute("""SELECT cog, function, SUM(duration) AS total FROM loop_stalls
+                                      WHERE timestamp >= ? AND cog IS NOT NULL
+                                      GROUP BY cog, function ORDER BY total DESC LIMIT 1""", (since,)).fetchone()
+    except sqlite3.OperationalError:  # LatencyCog hasn't created the tables yet
+        return None
+    if max_lag is None:
+        return None
+    return {'max_lag': max(max_lag, worst or 0), 'stalls': stalls, 'offender': f"{offender[0]}.{offender[1]}" if offender else None}
+
 class Info(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -90,12 +108,13 @@ class Info(commands.Cog):
         
     @discord.app_commands.command(name="stats", description="Shows the bot's current stats.")
     async def stats(self, interaction: discord.Interaction):
-        total_guilds = len(self.bot.guilds)
-        total_users = sum(guild.member_count for guild in self.bot.guilds)
-        total_channels = sum(len(guild.channels) for guild in self.bot.guilds)
-        total_text_channels = sum(len(guild.text_channels) for guild in self.bot.guilds)
-        total_voice_channels = total_channels - total_text_channels
-        total_roles = sum(len(guild.roles) for guild in self.bot.guilds)
+        stats = self.bot.stats
+        total_guilds = stats.guild_count
+        total_users = stats.members
+        total_channels = stats.channels
+        total_text_channels = stats.text_channels
+        total_voice_channels = stats.voice_channels
+        total_roles = stats.roles
         api_latency = round(self.bot.latency * 1000, 2)
         database_size = get_directory_size('./data')
         database_size_readable = convert_size(database_size)
@@ -111,24 +130,29 @@ class Info(commands.Cog):
         embed.add_field(name=":military_medal: Roles", value=str(total_roles), inline=True)
         embed.add_field(name=":stopwatch: API Latency", value=f"{api_latency} ms", inline=True)
         embed.add_field(name=":file_cabinet: Database Size", value=f"{database_size_readable} (Available: {available_space})", inline=True)
+        loop_lag = await asyncio.to_thread(get_loop_lag_summary)
+        if loop_lag:
+            value = f"max {loop_lag['max_lag'] * 1000:.0f} ms, {loop_lag['stalls']} stalls"
+            if loop_lag['offender']:
+                value += f" (worst: {loop_lag['offender']})"
+            embed.add_field(name=":hourglass: Event Loop Lag (24h)", value=value, inline=True)
 
         await interaction.response.send_message(embed=embed)
 
     @commands.command(usage="!version")
     async def version(self, ctx):
         """Shows the current version of the bot based on Git commits and the hash of the last commit."""
-        commit_count, last_commit_hash = self.get_git_commit_count_and_hash()
+        commit_count, last_commit_hash = await self.get_git_commit_count_and_hash()
         version = self.format_version(commit_count)
         await ctx.send(f"Current Version: {version} (Last Commit Hash: {last_commit_hash})")
     
-    def get_git_commit_count_and_hash(self):
+    async def get_git_commit_count_and_hash(self):
         """Returns the number of commits and the hash of the last commit in the Git repository."""
         try:
-            count = subprocess.check_output(["git", "rev-list", "--count", "HEAD"], stderr=subprocess.STDOUT).strip()
-            last_commit_hash = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.STDOUT).strip()
-            return int(count), last_commit_hash.decode('utf-8')
-        except subprocess.CalledProcessError as e:
-            print(f"Git command error: {e.output.decode()}")
+            # Cached until HEAD moves, so git only runs after a pull or commit
+            return await git_repo().version()
+        except GitError as e:
+            print(f"Git command error: {e}")
             return 0, "unknown"
         except Exception as e:
             print(f"Error getting commit count and hash: {e}")
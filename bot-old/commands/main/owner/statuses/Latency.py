@@ -1,37 +1,80 @@
 import discord
 from discord.ext import commands, tasks
 import sqlite3
-import os
+import asyncio
 import datetime
-from functools import partial
+from services.timeseries import open_store
+from services.badges import badges
 
 class LatencyCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.check_latency.start()
         self.db_path = "./data/db/latency.db"
+        # One sample per check, in day segments; three days so a 48 hour window is always covered
+        self.latencies = open_store().series('api_latency', interval=15 * 60, retention_days=3)
+        self.check_latency.start()
 
     def cog_unload(self):
         self.check_latency.cancel()
 
     async def db_execute(self, query, *params):
-        loop = self.bot.loop
         db_path = self.db_path
         def run():
             with sqlite3.connect(db_path) as conn:
                 conn.execute(query, params)
                 conn.commit()
-        await loop.run_in_executor(None, run)
+        await asyncio.to_thread(run)  # Unlike run_in_executor, keeps the trace id of the caller
+
+    async def db_executemany(self, query, rows):
+        db_path = self.db_path
+        def run():
+            with sqlite3.connect(db_path) as conn:
+                conn.executemany(query, rows)
+                conn.commit()
+        await asyncio.to_thread(run)
+
+    def import_old_latencies(self):
+        # Latencies used to be one row each in latency.db, move them over once
+        with sqlite3.connect(self.db_path) as conn:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'latencies'").fetchone():
+                return
+            rows = conn.execute("SELECT timestamp, latency FROM latencies").fetchall()
+            self.latencies.record_many((datetime.datetime.fromisoformat(timestamp), latency) for timestamp, latency in rows)
+            conn.execute("DROP TABLE latencies")
 
     async def create_db(self):
-        await self.db_execute("""CREATE TABLE IF NOT EXISTS latencies (
+        # Event loop lag per check interval and every stall the loop watchdog caught
+        await self.db_execute("""CREATE TABLE IF NOT EXISTS loop_lag (
                                   id INTEGER PRIMARY KEY,
                                   timestamp DATETIME NOT NULL,
-                                  latency REAL NOT NULL)""")
+                                  max_lag REAL NOT NULL,
+                                  avg_lag REAL NOT NULL,
+                                  stalls INTEGER NOT NULL)""")
+        await self.db_execute("""CREATE TABLE IF NOT EXISTS loop_stalls (
+                                  id INTEGER PRIMARY KEY,
+                                  timestamp DATETIME NOT NULL,
+                                  duration REAL NOT NULL,
+                                  cog TEXT,
+                                  function TEXT,
+                                  location TEXT,
+                                  stack TEXT)""")
 
     async def prune_db(self):
         two_days_ago = datetime.datetime.now() - datetime.timedelta(days=2)
-        await self.db_execute("DELETE FROM latencies WHERE timestamp < ?", two_days_ago)
+        for table in ('loop_lag', 'loop_stalls'):
+            await self.db_execute(f"DELETE FROM {table} WHERE timestamp < ?", two_days_ago)
+        await asyncio.to_thread(self.latencies.prune)
+
+    async def store_loop_lag(self):
+        watchdog = getattr(self.bot, 'loop_watchdog', None)
+        if watchdog is None:
+            return
+        summary = watchdog.drain()
+        await self.db_execute("INSERT INTO loop_lag (timestamp, max_lag, avg_lag, stalls) VALUES (?, ?, ?, ?)",
+                              datetime.datetime.now(), summary['max_lag'], summary['avg_lag'], len(summary['stalls']))
+        await self.db_executemany("INSERT INTO loop_stalls (timestamp, duration, cog, function, location, stack) VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(stall['timestamp'], stall['duration'], stall['cog'], stall['function'], stall['location'], stall['stack'])
+                                   for stall in summary['stalls']])
 
     @tasks.loop(minutes=15)
     async def check_latency(self):
@@ -39,15 +82,16 @@ class LatencyCog(commands.Cog):
         latency = self.bot.latency  # Get the bot's latency to the Discord API
 
         await self.create_db()
-        await self.db_execute("INSERT INTO latencies (timestamp, latency) VALUES (?, ?)",
-                              datetime.datetime.now(), latency)
+        await asyncio.to_thread(self.import_old_latencies)
+        await asyncio.to_thread(self.latencies.record, latency)
+        await self.store_loop_lag()
         await self.prune_db()
-        await self.update_latency_file(latency)
+        summary = await asyncio.to_thread(self.latencies.summary, datetime.datetime.now() - datetime.timedelta(hours=48))
+        await self.update_latency_file(summary.mean if summary.count else latency)
 
     async def update_latency_file(self, latency):
-        os.makedirs("../.github/badges", exist_ok=True)
-        with open("../.github/badges/latency.txt", "w") as f:
-            f.write(f"{latency*1000:.2f}ms")
+        # The badge is labelled as the 48 hour average
+        await asyncio.to_thread(badges.set, 'latency', f"{latency*1000:.2f}ms", '48hr_Avg_API_Latency', 'A020F0')
 
 async def setup(bot):
     await bot.add_cog(LatencyCog(bot))
@@ -5,12 +5,14 @@ import itertools
 class Presence(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Counts are read from bot.stats when shown, so they stay live
+        stats = bot.stats
         self.statuses = itertools.cycle([
-            ("with the !help command 📚", ActivityType.playing),  
-            (f"{len(self.bot.users)} users 👥", ActivityType.watching),
-            (f"{len(self.bot.guilds)} servers 🌐", ActivityType.watching),
-            (f"{sum(len(guild.channels) for guild in self.bot.guilds)} channels 💬", ActivityType.watching),
-            ("my creator, ExoHayvan 🩵", ActivityType.listening)
+            (lambda: "with the !help command 📚", ActivityType.playing),
+            (lambda: f"{stats.unique_users} users 👥", ActivityType.watching),
+            (lambda: f"{stats.guild_count} servers 🌐", ActivityType.watching),
+            (lambda: f"{stats.channels} channels 💬", ActivityType.watching),
+            (lambda: "my creator, ExoHayvan 🩵", ActivityType.listening)
         ])
         self.change_presence.start()  # Start the task
 
@@ -21,7 +23,7 @@ class Presence(commands.Cog):
     async def change_presence(self):
         """Automatically changes the bot's presence every 15 seconds."""
         next_status, activity_type = next(self.statuses)
-        activity = Activity(name=next_status, type=activity_type)
+        activity = Activity(name=next_status(), type=activity_type)
         await self.bot.change_presence(activity=activity)
 
     @change_presence.before_loop
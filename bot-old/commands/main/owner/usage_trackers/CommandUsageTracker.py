@@ -1,43 +1,121 @@
 import discord
 from discord.ext import commands, tasks
+from collections import defaultdict
+import datetime
 import sqlite3
 import os
 
-# Import the OwnerCommands cog
-# Adjust the import statement according to your project structure.
-from commands.main.owner.OwnerCommands import OwnerCommands
+FLUSH_SECONDS = 60
 
 class CommandUsageTracker(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.bot.add_listener(self.on_command_completion, "on_command_completion")
+        os.makedirs('./data', exist_ok=True)
+        self.conn = sqlite3.connect('./data/command_usage.db')
+        self.create_tables()
 
-    async def on_command_completion(self, ctx):
+        # Counts since the last flush
+        self.pending_usage = defaultdict(int)  # (command_name, user_id, guild_id, kind): uses
+        self.pending_hours = defaultdict(int)  # (hour, command_name, kind): uses
+        self.flush_usage.start()
+
+    def create_tables(self):
+        c = self.conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS command_usage (
+                        command_name TEXT NOT NULL,
+                        user_id TEXT NOT NULL,
+                        guild_id TEXT NOT NULL,
+                        kind TEXT NOT NULL,
+                        usage_count INT NOT NULL,
+                        PRIMARY KEY (command_name, user_id, guild_id, kind))''')
+        # Rollups for "top commands this week" without scanning per-user rows
+        for table, bucket in (('command_usage_hourly', 'hour'), ('command_usage_daily', 'day')):
+            c.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                            {bucket} TEXT NOT NULL,
+                            command_name TEXT NOT NULL,
+                            kind TEXT NOT NULL,
+                            usage_count INT NOT NULL,
+                            PRIMARY KEY ({bucket}, command_name, kind))''')
+
+        # Move the rows of the old table, which had no primary key, into the new one
+        if c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'CommandUsage'").fetchone():
+            c.execute('''INSERT INTO command_usage (command_name, user_id, guild_id, kind, usage_count)
+                         SELECT command_name, user_id, guild_id, 'prefix', SUM(usage_count) FROM CommandUsage
+                         GROUP BY command_name, user_id, guild_id
+                         ON CONFLICT DO UPDATE SET usage_count = usage_count + excluded.usage_count''')
+            c.execute('DROP TABLE CommandUsage')
+        self.conn.commit()
+
+    def cog_unload(self):
+        self.flush_usage.cancel()
+        self.flush()
+        self.conn.close()
+
+    def record(self, command_name, cog_name, user_id, guild_id, kind):
         # Ignore commands from the OwnerCommands cog
-        if isinstance(ctx.command.cog, OwnerCommands):
+        if cog_name == 'OwnerCommands':
+            return
+        guild_id = str(guild_id) if guild_id else 'dm'
+        hour = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:00')
+        self.pending_usage[(command_name, str(user_id), guild_id, kind)] += 1
+        self.pending_hours[(hour, command_name, kind)] += 1
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx):
+        self.record(ctx.command.qualified_name, ctx.command.cog_name, ctx.author.id, ctx.guild.id if ctx.guild else None, 'prefix')
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction, command):
+        cog_name = command.binding.qualified_name if getattr(command, 'binding', None) else None
+        self.record(command.qualified_name, cog_name, interaction.user.id, interaction.guild_id, 'slash')
+
+    def flush(self):
+        """Writes the pending counts with one upsert per table."""
+        if not self.pending_usage:
+            return
+        usage, self.pending_usage = self.pending_usage, defaultdict(int)
+        hours, self.pending_hours = self.pending_hours, defaultdict(int)
+        days = defaultdict(int)
+        for (hour, command_name, kind), count in hours.items():
+            days[(hour[:10], command_name, kind)] += count
+
+        c = self.conn.cursor()
+        c.executemany('''INSERT INTO command_usage (command_name, user_id, guild_id, kind, usage_count) VALUES (?, ?, ?, ?, ?)
+                         ON CONFLICT DO UPDATE SET usage_count = usage_count + excluded.usage_count''',
+                      [(*key, count) for key, count in usage.items()])
+        c.executemany('''INSERT INTO command_usage_hourly (hour, command_name, kind, usage_count) VALUES (?, ?, ?, ?)
+                         ON CONFLICT DO UPDATE SET usage_count = usage_count + excluded.usage_count''',
+                      [(*key, count) for key, count in hours.items()])
+        c.executemany('''INSERT INTO command_usage_daily (day, command_name, kind, usage_count) VALUES (?, ?, ?, ?)
+                         ON CONFLICT DO UPDATE SET usage_count = usage_count + excluded.usage_count''',
+                      [(*key, count) for key, count in days.items()])
+        # Hourly detail is only kept for two weeks, the daily rollup covers the rest
+        cutoff = (datetime.datetime.utcnow() - datetime.timedelta(days=14)).strftime('%Y-%m-%d %H:00')
+        c.execute('DELETE FROM command_usage_hourly WHERE hour < ?', (cutoff,))
+        self.conn.commit()
+
+    @tasks.loop(seconds=FLUSH_SECONDS)
+    async def flush_usage(self):
+        self.flush()
+
+    def top_commands(self, days=7, limit=10):
+        """[(command_name, kind, uses)] over the last days, from the daily rollup."""
+        self.flush()
+        since = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+        return self.conn.execute('''SELECT command_name, kind, SUM(usage_count) AS uses FROM command_usage_daily
+                                    WHERE day >= ? GROUP BY command_name, kind ORDER BY uses DESC LIMIT ?''',
+                                 (since, limit)).fetchall()
+
+    @commands.command(hidden=True)
+    async def topcommands(self, ctx, days: int = 7):
+        """Shows the most used commands over the last days."""
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
             return
 
-        command_name = ctx.command.qualified_name
-        user_id = ctx.author.id
-        guild_id = ctx.guild.id
-
-        conn = sqlite3.connect('./data/command_usage.db')
-        c = conn.cursor()
-        c.execute('CREATE TABLE IF NOT EXISTS CommandUsage (command_name text, user_id text, guild_id text, usage_count int)')
-        
-        # Check if there's a record for this command and this user in this guild
-        c.execute('SELECT usage_count FROM CommandUsage WHERE command_name = ? AND user_id = ? AND guild_id = ?', (command_name, user_id, guild_id))
-        result = c.fetchone()
-
-        if result is None:
-            # If not, insert a new record
-            c.execute('INSERT INTO CommandUsage VALUES (?, ?, ?, ?)', (command_name, user_id, guild_id, 1))
-        else:
-            # If yes, increment the usage_count
-            c.execute('UPDATE CommandUsage SET usage_count = usage_count + 1 WHERE command_name = ? AND user_id = ? AND guild_id = ?', (command_name, user_id, guild_id))
-
-        conn.commit()
-        conn.close()
+        rows = self.top_commands(days)
+        lines = [f"{'/' if kind == 'slash' else ctx.prefix}{command_name}: {uses}" for command_name, kind, uses in rows]
+        await ctx.send(f"Top commands, last {days} days:\n" + ("\n".join(lines) or "No commands used yet."))
 
 async def setup(bot):
     await bot.add_cog(CommandUsageTracker(bot))
@@ -1,49 +1,105 @@
 import discord
 from discord.ext import commands, tasks
+from collections import defaultdict
+import datetime
+import asyncio
 import sqlite3
 import os
+from services.badges import badges
+
+FLUSH_SECONDS = 60
 
 class MessageCount(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         db_path = './data/db/messagecount.db'
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
+
         self.conn = sqlite3.connect(db_path)
         self.cursor = self.conn.cursor()
-        
+
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS message_counts(
                                 user_id TEXT PRIMARY KEY,
                                 count INT NOT NULL
                               )''')
+        # Per guild per day, for trend graphs (guild_id is 'dm' for direct messages)
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS daily_message_counts(
+                                guild_id TEXT NOT NULL,
+                                day TEXT NOT NULL,
+                                count INT NOT NULL,
+                                PRIMARY KEY (guild_id, day)
+                              )''')
         self.conn.commit()
 
+        # Counts since the last flush, written in one go instead of a commit per message
+        self.pending_users = defaultdict(int)  # user_id: messages
+        self.pending_days = defaultdict(int)  # (guild_id, day): messages
+        self.cursor.execute('SELECT SUM(count) FROM message_counts')
+        self.total_messages = self.cursor.fetchone()[0] or 0
+
+        self.flush_counts.start()
         # Start the update file task
         self.update_message_count_file.start()
 
+    def cog_unload(self):
+        self.flush_counts.cancel()
+        self.update_message_count_file.cancel()
+        self.flush()
+        self.conn.close()
+
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author == self.bot.user:
             return
-        
-        user_id = str(message.author.id)
-        self.cursor.execute('SELECT count FROM message_counts WHERE user_id = ?', (user_id,))
-        result = self.cursor.fetchone()
-        if result:
-            new_count = result[0] + 1
-            self.cursor.execute('UPDATE message_counts SET count = ? WHERE user_id = ?', (new_count, user_id))
-        else:
-            self.cursor.execute('INSERT INTO message_counts (user_id, count) VALUES (?, ?)', (user_id, 1))
+
+        self.pending_users[str(message.author.id)] += 1
+        guild_id = str(message.guild.id) if message.guild else 'dm'
+        self.pending_days[(guild_id, message.created_at.date().isoformat())] += 1
+        self.total_messages += 1
+
+    def flush(self):
+        """Adds the pending counts to the database with one upsert per table."""
+        if not self.pending_users:
+            return
+        users, self.pending_users = self.pending_users, defaultdict(int)
+        days, self.pending_days = self.pending_days, defaultdict(int)
+        self.cursor.executemany('''INSERT INTO message_counts (user_id, count) VALUES (?, ?)
+                                   ON CONFLICT(user_id) DO UPDATE SET count = count + excluded.count''',
+                                users.items())
+        self.cursor.executemany('''INSERT INTO daily_message_counts (guild_id, day, count) VALUES (?, ?, ?)
+                                   ON CONFLICT(guild_id, day) DO UPDATE SET count = count + excluded.count''',
+                                [(guild_id, day, count) for (guild_id, day), count in days.items()])
         self.conn.commit()
 
-        # Optionally, you can call self.update_total_messages_file() here if you want to update the file immediately after each message.
-        # However, consider the performance implications.
+    @tasks.loop(seconds=FLUSH_SECONDS)
+    async def flush_counts(self):
+        self.flush()
+
+    def daily_counts(self, guild_id=None, days=30):
+        """Messages per day over the last days, for one guild or all of them (pending counts included)."""
+        self.flush()
+        since = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+        if guild_id is None:
+            self.cursor.execute('SELECT day, SUM(count) FROM daily_message_counts WHERE day >= ? GROUP BY day ORDER BY day', (since,))
+        else:
+            self.cursor.execute('SELECT day, count FROM daily_message_counts WHERE guild_id = ? AND day >= ? ORDER BY day', (str(guild_id), since))
+        return self.cursor.fetchall()
+
+    @commands.command(hidden=True)
+    async def messagetrend(self, ctx, days: int = 7):
+        """Shows messages per day in this server."""
+        if ctx.message.author.id != 276782057412362241:
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        rows = self.daily_counts(ctx.guild.id if ctx.guild else 'dm', days)
+        peak = max((count for day, count in rows), default=0)
+        lines = [f"`{day}` {'█' * round(20 * count / peak) if peak else ''} {count}" for day, count in rows]
+        await ctx.send(f"Total messages: {self.total_messages}\n" + ("\n".join(lines) or "No messages recorded yet."))
 
     async def update_total_messages_file(self):
-        self.cursor.execute('SELECT SUM(count) FROM message_counts')
-        total_messages = self.cursor.fetchone()[0]
-        with open('./.github/badges/messagecount.txt', 'w') as file:
-            file.write(str(total_messages))
+        # Kept up to date in memory, no SUM over the whole table
+        await asyncio.to_thread(badges.set, 'messagecount', self.total_messages, 'Messages_Processed', 'red')
 
     @tasks.loop(minutes=15)  # This task will now run every 15 minutes
     async def update_message_count_file(self):
@@ -54,4 +110,4 @@ class MessageCount(commands.Cog):
         await self.bot.wait_until_ready()
 
 async def setup(bot):
-    await bot.add_cog(MessageCount(bot))
\ No newline at end of file
+    await bot.add_cog(MessageCount(bot))
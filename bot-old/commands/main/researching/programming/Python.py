@@ -1,32 +1,176 @@
 from discord.ext import commands
 from discord import Embed
-import aiohttp
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+INFO_FIELDS = ('name', 'summary', 'author', 'version', 'license', 'package_url')
+
+class PackageCache:
+    """PyPI metadata cache with a TTL, ETag/Last-Modified revalidation and single-flight fetches.
+
+    Fresh entries are answered straight from memory. Stale ones are revalidated
+    with a conditional request, so an unchanged package costs a 304 instead of
+    the full JSON. Concurrent lookups for the same package share one request.
+    When db_path is set, entries are also kept in SQLite and survive restarts.
+    Memory holds the max_entries most recently used packages; unknown names
+    are only remembered in memory, so typos never reach the database.
+    """
+    def __init__(self, http, ttl=3600, missing_ttl=300, db_path=None, max_entries=512):
+        self.http = http
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl  # Unknown packages are remembered for less time
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # name: {'info', 'etag', 'last_modified', 'fetched_at'}, least recently used first
+        self.in_flight = {}  # name: future shared by concurrent lookups
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'coalesced': 0}
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            with sqlite3.connect(db_path) as conn:
+                conn.execute('''CREATE TABLE IF NOT EXISTS packages
+                                (name TEXT PRIMARY KEY, info TEXT, etag TEXT, last_modified TEXT, fetched_at REAL)''')
+                conn.execute("DELETE FROM packages WHERE info = 'null'")  # Unknown packages stored by older versions
+
+    async def get(self, package_name):
+        """Returns the package's info dict, or None if PyPI doesn't know it."""
+        name = package_name.lower()
+        entry = self.entries.get(name)
+        if entry is None:
+            entry = await asyncio.to_thread(self.load, name)
+            if entry:
+                self.remember(name, entry)
+        else:
+            self.entries.move_to_end(name)
+        if entry and time.time() - entry['fetched_at'] < (self.ttl if entry['info'] else self.missing_ttl):
+            self.stats['hits'] += 1
+            return entry['info']
+
+        if name in self.in_flight:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self.in_flight[name])
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[name] = future
+        try:
+            info = await self.fetch(name, entry)
+            future.set_result(info)
+            return info
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting on it, don't leave the exception unretrieved
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[name]
+
+    async def fetch(self, name, entry):
+        headers = {}
+        if entry and entry['info']:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        async with self.http.get(f'https://pypi.org/pypi/{name}/json', headers=headers) as r:
+            if r.status == 304 and entry:
+                self.stats['revalidated'] += 1
+                entry['fetched_at'] = time.time()
+                await self.store(name, entry)
+                return entry['info']
+
+            self.stats['misses'] += 1
+            if r.status == 200:
+                data = await r.json()
+                info = {field: data['info'].get(field) for field in INFO_FIELDS}
+            elif r.status == 404:
+                info = None
+            else:
+                # Upstream trouble, serve what we had rather than failing
+                return entry['info'] if entry else None
+            entry = {
+                'info': info,
+                'etag': r.headers.get('ETag'),
+                'last_modified': r.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+            }
+        await self.store(name, entry)
+        return info
+
+    def remember(self, name, entry):
+        self.entries[name] = entry
+        self.entries.move_to_end(name)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def store(self, name, entry):
+        self.remember(name, entry)
+        if self.db_path:
+            await asyncio.to_thread(self.save, name, entry)
+
+    def load(self, name):
+        """Reads an entry from SQLite. Blocks; called through asyncio.to_thread."""
+        if not self.db_path:
+            return None
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT info, etag, last_modified, fetched_at FROM packages WHERE name=?", (name,)).fetchone()
+        if row is None:
+            return None
+        return {'info': json.loads(row[0]), 'etag': row[1], 'last_modified': row[2], 'fetched_at': row[3]}
+
+    def save(self, name, entry):
+        """Writes an entry to SQLite, or drops the row of a package PyPI no longer knows. Blocks; called through asyncio.to_thread."""
+        with sqlite3.connect(self.db_path) as conn:
+            if entry['info'] is None:
+                conn.execute("DELETE FROM packages WHERE name=?", (name,))
+                return
+            conn.execute("INSERT OR REPLACE INTO packages (name, info, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                         (name, json.dumps(entry['info']), entry['etag'], entry['last_modified'], entry['fetched_at']))
+
+    def hit_rate(self):
+        lookups = sum(self.stats.values())
+        return (self.stats['hits'] + self.stats['coalesced']) / lookups if lookups else 0.0
 
 class Python(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.http = bot.http_service
+        self.packages = PackageCache(self.http, db_path='./data/db/pypicache.db')
 
     @commands.command()
     async def package_info(self, ctx, package_name: str):
         """Provides information about a pip package."""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f'https://pypi.org/pypi/{package_name}/json') as r:
-                if r.status == 200:
-                    data = await r.json()
-                    info = data['info']
-                    embed = Embed(title=info['name'], description=info['summary'], color=0x3498db)
-                    embed.add_field(name='Author', value=info['author'])
-                    embed.add_field(name='Version', value=info['version'])
-                    embed.add_field(name='License', value=info['license'])
-                    embed.add_field(name='Package Home Page', value=info['package_url'])
-                    await ctx.send(embed=embed)
-                else:
-                    await ctx.send("Package not found.")
+        info = await self.packages.get(package_name)
+        if info:
+            embed = Embed(title=info['name'], description=info['summary'], color=0x3498db)
+            embed.add_field(name='Author', value=info['author'])
+            embed.add_field(name='Version', value=info['version'])
+            embed.add_field(name='License', value=info['license'])
+            embed.add_field(name='Package Home Page', value=info['package_url'])
+            await ctx.send(embed=embed)
+        else:
+            await ctx.send("Package not found.")
 
     @package_info.error
     async def package_info_error(self, ctx, error):
         if isinstance(error, commands.MissingRequiredArgument):
             await ctx.send(f"Missing argument! Usage: `{ctx.prefix}package_info <package_name>`. This command is currently to get info about python packages!")
-                
+
+    @commands.command(hidden=True)
+    async def package_cache(self, ctx):
+        """Shows hit rates for the package_info cache."""
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.send("You don't have permission to use this command.")
+            return
+
+        stats = self.packages.stats
+        await ctx.send(
+            f"Package cache: {len(self.packages.entries)} packages in memory, hit rate {self.packages.hit_rate():.1%}\n"
+            f"Hits: {stats['hits']} | Coalesced: {stats['coalesced']} | Revalidated: {stats['revalidated']} | Fetched: {stats['misses']}"
+        )
+
 async def setup(bot):
     await bot.add_cog(Python(bot))
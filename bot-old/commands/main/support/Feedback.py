@@ -1,9 +1,11 @@
 import discord
 from discord.ext import commands
-from github import GithubIntegration
-import github
 import json
 import os
+from services.lazy import lazy_import
+
+# PyGithub is slow to import and only needed once feedback is sent
+github = lazy_import('github')
 
 def get_config():
     with open('../../config.json', 'r') as f:
@@ -28,7 +30,7 @@ class Feedback(commands.Cog):
                       f"**Channel:** {interaction.channel}")
 
         private_key = open(self.private_key_path, 'r').read()
-        integration = GithubIntegration(self.app_id, private_key)
+        integration = github.GithubIntegration(self.app_id, private_key)
         token = integration.get_access_token(self.installation_id)
 
         try:
@@ -1,17 +1,15 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-import logging
+from services.logs import get_logger
 
 # Initialize logging
-logger = logging.getLogger('Template.py')
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='./logs/Template.py.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
-logger.propagate = False
+logger = get_logger('Template.py')
 logger.info("Template Cog Loaded. Logging started...")
 
+# Cogs that must be loaded before this one, e.g. ['commands.main.anime.anilist'] ('*' loads it last)
+COG_DEPENDENCIES = []
+
 class Template(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
@@ -1,31 +1,230 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+from collections import Counter
 import asyncio
+import sqlite3
+import time
+from services.logs import get_logger
+
+logger = get_logger('AnnouncementCog.py')
+
+# Discord allows 50 requests per second per bot across all routes; leave room for everything else the bot does
+GLOBAL_RATE = 50
+BROADCAST_RATE = GLOBAL_RATE - 10
+WORKERS = 20  # Enough sends in flight to keep BROADCAST_RATE busy at ~500ms per request
+FLUSH_EVERY = 25  # Results written per batch; a crash resends at most this many
+
+class RateLimiter:
+    """Spaces calls 1/rate seconds apart. halve() backs off when Discord answers 429 anyway."""
+    def __init__(self, rate):
+        self.rate = rate
+        self.next_slot = 0.0
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def halve(self):
+        self.rate = max(1, self.rate / 2)
 
 class AnnouncementCog(commands.Cog):
+    """Broadcasts an announcement to every guild as a resumable job.
+
+    A job and one delivery row per guild are stored in announcements.db, and
+    results are written back in batches as the job runs. Jobs still running
+    when the bot stops resume with their pending guilds once it is ready
+    again. Target channels are resolved once per guild and cached in the DB.
+    Sends go through WORKERS concurrent workers paced to BROADCAST_RATE,
+    under Discord's global limit, and the pace halves on a 429.
+    """
     def __init__(self, bot):
         self.bot = bot
+        self.db_path = './data/db/announcements.db'
+        self.targets = {}  # guild_id: channel_id
+        self.tasks = {}  # job_id: asyncio.Task
+        self.progress = {}  # job_id: live counters of a running job
+        self.create_tables()
+
+    def create_tables(self):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                        id INTEGER PRIMARY KEY,
+                        message TEXT NOT NULL,
+                        report_channel_id INTEGER,
+                        status TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        finished_at REAL)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS deliveries (
+                        job_id INTEGER NOT NULL,
+                        guild_id INTEGER NOT NULL,
+                        status TEXT NOT NULL,
+                        error TEXT,
+                        PRIMARY KEY (job_id, guild_id))''')
+        c.execute('''CREATE TABLE IF NOT EXISTS target_channels (
+                        guild_id INTEGER PRIMARY KEY,
+                        channel_id INTEGER NOT NULL)''')
+        conn.commit()
+        c.execute('SELECT guild_id, channel_id FROM target_channels')
+        self.targets = dict(c.fetchall())
+        conn.close()
+
+    async def cog_load(self):
+        self.bot.loop.create_task(self.resume_jobs())
+
+    def cog_unload(self):
+        # Jobs stay 'running' in the DB and pick up where they stopped on the next load
+        for task in self.tasks.values():
+            task.cancel()
+
+    def db(self, query, params=(), many=False):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            c = conn.cursor()
+            if many:
+                c.executemany(query, params)
+            else:
+                c.execute(query, params)
+            rows = c.fetchall()
+            conn.commit()
+            return rows, c.lastrowid
+        finally:
+            conn.close()
+
+    async def resume_jobs(self):
+        await self.bot.wait_until_ready()
+        rows, _ = await asyncio.to_thread(self.db, "SELECT id FROM jobs WHERE status = 'running'")
+        for (job_id,) in rows:
+            if job_id not in self.tasks:
+                logger.info(f"Resuming announcement job {job_id}")
+                self.start_job(job_id)
+
+    def start_job(self, job_id):
+        task = self.bot.loop.create_task(self.run_job(job_id))
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+
+    def resolve_channel(self, guild):
+        """The cached target channel if it is still usable, otherwise the system channel or the first sendable one."""
+        channel = guild.get_channel(self.targets.get(guild.id, 0))
+        if channel and channel.permissions_for(guild.me).send_messages:
+            return channel
+        candidates = [guild.system_channel] if guild.system_channel else []
+        candidates += guild.text_channels
+        channel = next((ch for ch in candidates if ch.permissions_for(guild.me).send_messages), None)
+        if channel:
+            self.targets[guild.id] = channel.id
+        else:
+            self.targets.pop(guild.id, None)
+        return channel
+
+    async def run_job(self, job_id):
+        rows, _ = await asyncio.to_thread(self.db, "SELECT message, report_channel_id FROM jobs WHERE id = ?", (job_id,))
+        message, report_channel_id = rows[0]
+        pending, _ = await asyncio.to_thread(self.db, "SELECT guild_id FROM deliveries WHERE job_id = ? AND status = 'pending'", (job_id,))
+        queue = asyncio.Queue()
+        for (guild_id,) in pending:
+            queue.put_nowait(guild_id)
+
+        limiter = RateLimiter(BROADCAST_RATE)
+        results = []  # (status, error, job_id, guild_id) not yet written
+        progress = self.progress[job_id] = {'total': len(pending), 'sent': 0, 'failed': 0, 'skipped': 0,
+                                            'errors': Counter(), 'started': time.monotonic()}
+
+        async def flush():
+            batch = results[:]
+            results.clear()
+            if batch:
+                await asyncio.to_thread(self.db, "UPDATE deliveries SET status = ?, error = ? WHERE job_id = ? AND guild_id = ?", batch, True)
+
+        async def worker():
+            while not queue.empty():
+                guild_id = queue.get_nowait()
+                guild = self.bot.get_guild(guild_id)
+                channel = self.resolve_channel(guild) if guild else None
+                if channel is None:
+                    status, error = 'skipped', 'no sendable channel' if guild else 'left guild'
+                else:
+                    await limiter.wait()
+                    try:
+                        await channel.send(message)
+                        status, error = 'sent', None
+                    except discord.HTTPException as e:
+                        if e.status == 429:
+                            limiter.halve()
+                        if e.status in (403, 404):
+                            self.targets.pop(guild_id, None)  # Resolve again next time
+                        status, error = 'failed', f"{e.status} {e.text or type(e).__name__}"
+                    except Exception as e:
+                        status, error = 'failed', type(e).__name__
+                progress[status] += 1
+                if error and status == 'failed':
+                    progress['errors'][error] += 1
+                results.append((status, error, job_id, guild_id))
+                if len(results) >= FLUSH_EVERY:
+                    await flush()
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(WORKERS, max(1, len(pending))))))
+        finally:
+            await flush()
+            await asyncio.to_thread(self.db, "INSERT INTO target_channels (guild_id, channel_id) VALUES (?, ?) ON CONFLICT DO UPDATE SET channel_id = excluded.channel_id",
+                                    list(self.targets.items()), True)
+        await asyncio.to_thread(self.db, "UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ?", (time.time(), job_id))
+        report = self.format_progress(job_id)
+        self.progress.pop(job_id, None)
+        logger.info(report)
+        channel = self.bot.get_channel(report_channel_id) if report_channel_id else None
+        if channel:
+            await channel.send(report)
+
+    def format_progress(self, job_id):
+        progress = self.progress[job_id]
+        elapsed = time.monotonic() - progress['started']
+        done = progress['sent'] + progress['failed'] + progress['skipped']
+        rate = progress['sent'] / elapsed if elapsed else 0
+        report = (f"Announcement #{job_id}: {done}/{progress['total']} guilds, {progress['sent']} sent, "
+                  f"{progress['failed']} failed, {progress['skipped']} skipped, {rate:.1f} messages/s over {elapsed:.0f}s")
+        if progress['errors']:
+            report += "\nFailures: " + ", ".join(f"{error} ×{count}" for error, count in progress['errors'].most_common(5))
+        return report
 
     @app_commands.command(name="announcement", description="Send an announcement to all default channels.")
     async def announcement(self, interaction: discord.Interaction, message: str):
         """Send an announcement to all default channels."""
-        await interaction.response.send_message("Announcement is being sent to all servers. This may take some time.", ephemeral=True)
-        
-        for guild in self.bot.guilds:
-            # Attempt to get the system channel or the first text channel
-            channel = guild.system_channel or next((ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages), None)
-            if channel:
-                try:
-                    await channel.send(message)
-                except Exception as e:
-                    print(f"Failed to send message to {guild.name}: {e}")
-            
-            # Add a delay between each message
-            await asyncio.sleep(1) # Adjust the delay as needed
-
-        # Follow-up message indicating completion
-        await interaction.followup.send("Announcement has been sent to all servers.")
+        if not await self.bot.is_owner(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        guild_ids = [guild.id for guild in self.bot.guilds]
+        _, job_id = await asyncio.to_thread(self.db, "INSERT INTO jobs (message, report_channel_id, status, created_at) VALUES (?, ?, 'running', ?)",
+                                            (message, interaction.channel_id, time.time()))
+        await asyncio.to_thread(self.db, "INSERT INTO deliveries (job_id, guild_id, status) VALUES (?, ?, 'pending')",
+                                [(job_id, guild_id) for guild_id in guild_ids], True)
+        self.start_job(job_id)
+        await interaction.response.send_message(
+            f"Announcement #{job_id} is being sent to {len(guild_ids)} servers. A report will be posted here when it's done; "
+            f"`/announcement_status {job_id}` shows progress.", ephemeral=True)
+
+    @app_commands.command(name="announcement_status", description="Show the progress of an announcement.")
+    async def announcement_status(self, interaction: discord.Interaction, job_id: int):
+        if not await self.bot.is_owner(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        if job_id in self.progress:
+            await interaction.response.send_message(self.format_progress(job_id), ephemeral=True)
+            return
+        rows, _ = await asyncio.to_thread(self.db, "SELECT status, COUNT(*) FROM deliveries WHERE job_id = ? GROUP BY status", (job_id,))
+        if not rows:
+            await interaction.response.send_message(f"No announcement #{job_id}.", ephemeral=True)
+            return
+        await interaction.response.send_message(f"Announcement #{job_id}: " + ", ".join(f"{count} {status}" for status, count in rows), ephemeral=True)
 
 async def setup(bot):
     await bot.add_cog(AnnouncementCog(bot))
@@ -1,19 +1,18 @@
 from discord.ext import commands
 import os
-import aiohttp
 import discord
 
 class EmojiManager(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.emoji_folder = './data/emojis/'
+        self.http = bot.http_service
 
     async def download_emoji(self, url, file_path):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    with open(file_path, 'wb') as f:
-                        f.write(await response.read())
+        async with self.http.get(url) as response:
+            if response.status == 200:
+                with open(file_path, 'wb') as f:
+                    f.write(await response.read())
 
     @commands.command(usage="!emoji_save <emoji1> <emoji2> ...")
     @commands.has_permissions(manage_guild=True)
@@ -3,7 +3,10 @@ from discord.ext import commands
 import sqlite3
 import asyncio
 from sqlite3 import Error
-from graphviz import Digraph
+from services.lazy import lazy_import
+
+# graphviz is only needed to draw a tree
+graphviz = lazy_import('graphviz')
 
 class Family(commands.Cog):
     def __init__(self, bot):
@@ -23,7 +26,7 @@ class Family(commands.Cog):
         return conn
 
     async def generate_family_tree(self, member_id):
-        dot = Digraph(comment='Family Tree')
+        dot = graphviz.Digraph(comment='Family Tree')
     
         # Create a cursor and select all accepted adoption requests involving the member
         cursor = self.conn.cursor()
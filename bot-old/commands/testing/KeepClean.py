@@ -1,9 +1,18 @@
+import discord
 from discord.ext import commands
 import sqlite3
 import asyncio
 import datetime
+import time
 from discord.ext import tasks
-import logging
+from services.logs import get_logger
+
+logger = get_logger('KeepClean.py')
+
+BULK_BATCH = 100  # Most messages one bulk delete takes
+BULK_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)  # Discord rejects older ones, with a margin
+DELETE_RATE = 4  # Delete requests per second, shared by all channels
+SAVE_EVERY = 500  # Messages handled between watermark writes, a restart goes over at most this many again
 
 def create_table(db_path):
     with sqlite3.connect(db_path) as conn:
@@ -14,13 +23,38 @@ def create_table(db_path):
                 time_limit INTEGER NOT NULL
             )
         """)
+        # Id of the newest message already dealt with, history before it is never read again
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(Channels)")]
+        if 'last_cleaned' not in columns:
+            cursor.execute("ALTER TABLE Channels ADD COLUMN last_cleaned INTEGER")
         conn.commit()
 
+class RateBudget:
+    """Token bucket shared by every channel being cleaned, so they run at once without going over the delete rate."""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
 class KeepClean(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db_path = './data/db/keepclean.db'
         create_table(self.db_path)  # Ensure table exists
+        self.budget = RateBudget(DELETE_RATE)
         self.check_messages.start()
 
     def cog_unload(self):
@@ -46,36 +80,106 @@ class KeepClean(commands.Cog):
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT channel_id, time_limit FROM Channels")
+                cursor.execute("SELECT channel_id, time_limit, last_cleaned FROM Channels")
                 channels = cursor.fetchall()
-    
-            for channel_id, time_limit in channels:
+
+            jobs = []
+            for channel_id, time_limit, last_cleaned in channels:
                 channel = self.bot.get_channel(channel_id)
                 if channel:
-                    chunk_size = 50
-                    oldest_message_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=time_limit)
-    
-                    while True:
-                        messages = [message async for message in channel.history(limit=chunk_size, after=oldest_message_time)]
-    
-                        if not messages:
-                            break
-    
-                        for message in messages:
-                            await message.delete()
-                            await asyncio.sleep(1.2)
-    
-                        logging.info(f"Deleted {len(messages)} messages in channel {channel_id}.")
+                    jobs.append((channel_id, self.clean_channel(channel, time_limit, last_cleaned)))
                 else:
                     self.remove_channel(channel_id)
-                    logging.warning(f"Channel {channel_id} not found or bot has no access.")
+                    logger.warning(f"Channel {channel_id} not found or bot has no access.")
+            # All channels at once, the shared budget keeps the total delete rate in check
+            results = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+            for (channel_id, _), result in zip(jobs, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Cleaning channel {channel_id} failed: {result!r}")
         except Exception as e:
-            logging.error(f"Error in check_messages: {e}")
-        
+            logger.error(f"Error in check_messages: {e}")
+
+    @check_messages.before_loop
+    async def before_check_messages(self):
+        await self.bot.wait_until_ready()
+
+    async def clean_channel(self, channel, time_limit, last_cleaned):
+        """Deletes the messages older than time_limit minutes that were posted after last_cleaned.
+
+        Messages young enough for bulk deletion go 100 per request; older ones
+        are deleted one by one. The new last_cleaned is kept in memory and
+        written every SAVE_EVERY messages and once at the end, so an
+        interrupted pass resumes close to where it stopped.
+        """
+        now = discord.utils.utcnow()
+        cutoff = now - datetime.timedelta(minutes=time_limit)
+        bulk_after = now - BULK_MAX_AGE
+        after = discord.Object(last_cleaned) if last_cleaned else None
+        watermark = last_cleaned
+        unsaved = 0
+        batch = []
+        deleted = 0
+        try:
+            async for message in channel.history(limit=None, after=after, before=cutoff, oldest_first=True):
+                if message.created_at > bulk_after:
+                    batch.append(message)
+                    if len(batch) < BULK_BATCH:
+                        continue
+                    deleted += await self.bulk_delete(channel, batch)
+                    watermark = batch[-1].id
+                    unsaved += len(batch)
+                    batch = []
+                else:
+                    await self.budget.acquire()
+                    try:
+                        await message.delete()
+                        deleted += 1
+                    except discord.NotFound:
+                        pass
+                    watermark = message.id
+                    unsaved += 1
+                if unsaved >= SAVE_EVERY:
+                    await asyncio.to_thread(self.set_last_cleaned, channel.id, watermark)
+                    unsaved = 0
+            if batch:
+                deleted += await self.bulk_delete(channel, batch)
+        except discord.Forbidden:
+            logger.warning(f"Missing permissions to clean channel {channel.id}.")
+        except discord.HTTPException as e:
+            logger.error(f"Cleaning channel {channel.id} stopped: {e}")
+        else:
+            # Everything before the cutoff has been handled
+            watermark = discord.utils.time_snowflake(cutoff)
+        if watermark != last_cleaned:
+            await asyncio.to_thread(self.set_last_cleaned, channel.id, watermark)
+        if deleted:
+            logger.info(f"Deleted {deleted} messages in channel {channel.id}.")
+
+    async def bulk_delete(self, channel, messages):
+        await self.budget.acquire()
+        try:
+            await channel.delete_messages(messages)
+        except discord.NotFound:
+            # One of them was already gone, which fails the whole request; fall back to single deletes
+            for message in messages:
+                await self.budget.acquire()
+                try:
+                    await message.delete()
+                except discord.NotFound:
+                    pass
+        return len(messages)
+
+    def set_last_cleaned(self, channel_id, message_id):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE Channels SET last_cleaned = ? WHERE channel_id = ?", (message_id, channel_id))
+            conn.commit()
+
     def update_channel(self, channel_id, time_limit):
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            cursor.execute("REPLACE INTO Channels (channel_id, time_limit) VALUES (?, ?)", (channel_id, time_limit))
+            # Changing the limit keeps last_cleaned
+            cursor.execute("""INSERT INTO Channels (channel_id, time_limit) VALUES (?, ?)
+                              ON CONFLICT(channel_id) DO UPDATE SET time_limit = excluded.time_limit""", (channel_id, time_limit))
             conn.commit()
 
     def remove_channel(self, channel_id):
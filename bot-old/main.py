@@ -1,4 +1,5 @@
 import os
+import time
 import discord
 from discord.ext import commands
 import json
@@ -6,8 +7,20 @@ import logging
 import asyncio
 import sqlite3
 from datetime import datetime, timedelta
+from services.http import HTTPService
+from services.cog_loader import load_cogs
+from services.tree_sync import sync_tree_if_changed
+from services.hot_reload import HotReloader
+from services.logs import get_logger, pipeline
+from services.trace import TracedCommandTree, new_trace
+from services.metrics import Metrics, MetricsServer
+from services.loop_watchdog import LoopWatchdog
+from services.stats import BotStats
+
+STARTED_AT = time.perf_counter()
 
 logging.basicConfig(level=logging.INFO)
+command_logger = get_logger('Commands', 'commands.log')
 
 # Create logs directory if it doesn't exist
 if not os.path.exists('./logs'):
@@ -95,14 +108,67 @@ async def determine_prefix(bot, message):
 
     return commands.when_mentioned_or(prefix)(bot, message)
 
-bot = commands.Bot(command_prefix=determine_prefix, intents=intents, case_insensitive=True)
-bot.help_command = CustomHelpCommand()
-
 def get_config():
     with open('../../config.json', 'r') as f:
         config = json.load(f)
     return config
 
+class Bot(commands.Bot):
+    def __init__(self, *args, http_service=None, hot_reload=False, metrics_port=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Shared HTTP sessions for cogs, see services/http.py
+        self.http_service = http_service or HTTPService()
+        # Filled in by services/cog_loader.py once cogs are loaded
+        self.cog_load_report = None
+        self.first_ready = True
+        # Reload cogs in place when their files change, see services/hot_reload.py
+        self.hot_reloader = HotReloader(self) if hot_reload else None
+        # Command latency, errors, concurrency and loop lag, see services/metrics.py
+        self.metrics = Metrics()
+        self.metrics.install(self)
+        self.metrics_server = MetricsServer(self.metrics, port=metrics_port) if metrics_port else None
+        # Loop lag and stacks of blocking calls, stored by LatencyCog, see services/loop_watchdog.py
+        self.loop_watchdog = LoopWatchdog(on_lag=self.metrics.observe_lag)
+        # Guild, user, channel and role totals kept current from gateway events, see services/stats.py
+        self.stats = BotStats()
+        self.stats.install(self)
+
+    async def setup_hook(self):
+        # Runs once per process, unlike on_ready which fires again on every gateway reconnect
+        print("Loading cogs...")
+        self.cog_load_report = await load_cogs(self, 'commands')
+        print(f"Cogs loaded ({self.cog_load_report['loaded']} cogs)")
+        await sync_tree_if_changed(self.tree)  # Synchronizes slash commands with Discord when they changed
+        if self.hot_reloader:
+            self.hot_reloader.start()
+        self.loop_watchdog.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+
+    async def invoke(self, ctx):
+        # Everything the command logs, including its database and HTTP work, carries this trace id
+        if ctx.command is not None:
+            new_trace(ctx.message.id)
+            command_logger.debug(f"{ctx.command.qualified_name} by {ctx.author.id} in {ctx.guild.id if ctx.guild else 'DM'}")
+        await super().invoke(ctx)
+
+    async def close(self):
+        if self.hot_reloader:
+            self.hot_reloader.stop()
+        self.loop_watchdog.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await self.http_service.close()
+        await super().close()
+
+config = get_config()
+pipeline.set_format(config.get('log_format', 'text'))  # 'json' for one JSON object per line
+
+bot = Bot(command_prefix=determine_prefix, intents=intents, case_insensitive=True, tree_cls=TracedCommandTree,
+          http_service=HTTPService(host_overrides=config.get('http_host_overrides')),
+          hot_reload=config.get('hot_reload', False), metrics_port=config.get('metrics_port'))
+bot.help_command = CustomHelpCommand()
+
 def initialize_database():
     conn = sqlite3.connect('./data/prefix.db')
     cursor = conn.cursor()
@@ -245,11 +311,7 @@ async def remove(ctx, user: discord.User):
 @bot.command(hidden=True)
 async def tos_stats(ctx):
     # Step 1: Count total number of unique users the bot can see
-    total_users = set()  # Using a set to avoid counting duplicates
-    for guild in bot.guilds:
-        for member in guild.members:
-            total_users.add(member.id)
-    total_count = len(total_users)
+    total_count = bot.stats.unique_users
 
     # Step 2: Count users who've accepted the TOS
     conn = sqlite3.connect('./data/db/tos.db')
@@ -278,51 +340,15 @@ async def accept_tos(ctx):
     await asyncio.sleep(60)
     await ctx.message.delete()
             
-async def load_cogs(bot, root_dir):
-    tasks = []
-    num_cogs = 0
-    
-    # Load all cogs except those in commands/docs
-    for dirpath, dirnames, filenames in os.walk(root_dir):
-        if "commands/docs" in dirpath:  # skip this directory for now
-            continue
-        for filename in filenames:
-            if filename.endswith('.py'):
-                await handle_loading(dirpath, filename, bot, tasks)
-                num_cogs += 1
-
-    # Now, load cogs in commands/docs directory
-    for dirpath, dirnames, filenames in os.walk(os.path.join(root_dir, 'docs')):
-        for filename in filenames:
-            if filename.endswith('.py'):
-                await handle_loading(dirpath, filename, bot, tasks)
-                num_cogs += 1
-
-    await asyncio.gather(*tasks)
-    return num_cogs
-
-async def handle_loading(dirpath, filename, bot, tasks):
-    path = os.path.join(dirpath, filename)
-    module = path.replace(os.sep, ".")[:-3]
-    cog = module.replace(".", "_")
-    try:
-        task = asyncio.create_task(bot.load_extension(module))
-        tasks.append(task)
-        print(f"Loaded Cog: {module}")
-    except Exception as e:
-        print(f"Failed to load Cog: {module}\n{e}")
-    try:
-        setup = getattr(bot.get_cog(cog), "setup")
-        if setup:
-            tasks.append(asyncio.create_task(setup(bot)))
-    except AttributeError:
-        pass
-
 @bot.event
 async def on_ready():
     print(f"We have logged in as {bot.user}")
+    if not bot.first_ready:
+        print("Reconnected to the gateway.")
+        return
+    bot.first_ready = False
+    print(f"Ready {time.perf_counter() - STARTED_AT:.1f}s after startup")
 
-    channel = None
     # Check if restart_id.temp exists
     if os.path.exists('restart_id.temp'):
         with open('restart_id.temp', 'r') as f:
@@ -332,19 +358,11 @@ async def on_ready():
         if channel_id:
             channel = bot.get_channel(channel_id)
             if channel:
-                print("I am starting back up!")
+                print("I have restarted!")
         
-        print("Loading cogs...")
         # Remove the file after reading it
         os.remove('restart_id.temp')
 
-    # Always load command cogs, regardless of whether restart_id.temp exists or not
-    num_cogs = await load_cogs(bot, 'commands')
-    await bot.tree.sync()  # Synchronizes slash commands with Discord
-    if channel:
-        print(f"Cogs loaded ({num_cogs} cogs)")
-        print("I have restarted!")
-
 @bot.event
 async def on_message(message):
     if message.author.bot:
@@ -380,5 +398,4 @@ initialize_database()
 initialize_tos_database()
 initialize_blacklist_database()
 
-config = get_config()
 bot.run(config['bot_token'])
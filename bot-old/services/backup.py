@@ -0,0 +1,173 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+
+from services.logs import get_logger
+
+logger = get_logger('Backup')
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+SKIP_SUFFIXES = ('-wal', '-shm', '-journal')
+TIMESTAMP = '%Y%m%d-%H%M%S'
+
+def file_signature(path):
+    """(size, mtime) of a file and its WAL, the cheap test for "did anything change"."""
+    signature = []
+    for candidate in (path, path + '-wal'):
+        try:
+            stat = os.stat(candidate)
+            signature += [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            signature += [None, None]
+    return signature
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def snapshot_sqlite(source, target):
+    """A consistent copy through SQLite's online backup API, taken in steps so writers aren't held up."""
+    src = sqlite3.connect(f'file:{source}?mode=ro', uri=True)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst, pages=1024)
+    finally:
+        dst.close()
+        src.close()
+
+class BackupPipeline:
+    """Snapshots the files under a data directory into compressed, versioned copies.
+
+    For each file:
+      1. its size and mtime (and its WAL's) are compared with the last run, an
+         unchanged file costs one stat() and nothing else;
+      2. SQLite databases are copied with the online backup API into a
+         staging directory, other files are copied as they are;
+      3. the copy is hashed, and dropped if it matches the last kept version
+         (a write that changed nothing, e.g. a VACUUM or a rewritten badge);
+      4. otherwise it is gzipped to <backup_dir>/<path>/<timestamp>.gz.
+    Versions are then thinned to the newest `keep_last` plus the newest of
+    each of the last `keep_daily` days.
+
+    run() blocks; GitAutoBackup calls it through asyncio.to_thread.
+    """
+    def __init__(self, data_dir='./data', backup_dir='./backups', keep_last=24, keep_daily=30):
+        self.data_dir = data_dir
+        self.backup_dir = backup_dir
+        self.staging_dir = os.path.join(backup_dir, '.staging')
+        self.manifest_path = os.path.join(backup_dir, 'manifest.json')
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def files(self):
+        backup_dir = os.path.abspath(self.backup_dir)
+        for root, dirs, names in os.walk(self.data_dir):
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != backup_dir]
+            for name in sorted(names):
+                if not name.endswith(SKIP_SUFFIXES):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, self.data_dir), path
+
+    def backup_file(self, relative, path, entry, timestamp):
+        """Returns the new manifest entry; 'stored' says whether a new version was written."""
+        signature = file_signature(path)
+        if entry and entry.get('signature') == signature:
+            return {**entry, 'stored': False}
+
+        staged = os.path.join(self.staging_dir, relative.replace(os.sep, '__'))
+        if path.endswith(SQLITE_SUFFIXES):
+            if os.path.exists(staged):
+                os.remove(staged)
+            snapshot_sqlite(path, staged)
+        else:
+            shutil.copyfile(path, staged)
+        try:
+            digest = sha256_file(staged)
+            if entry and entry.get('sha256') == digest:
+                return {**entry, 'signature': signature, 'stored': False}
+
+            version_dir = os.path.join(self.backup_dir, relative)
+            os.makedirs(version_dir, exist_ok=True)
+            target = os.path.join(version_dir, f'{timestamp}.gz')
+            with open(staged, 'rb') as src, gzip.open(target + '.tmp', 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(target + '.tmp', target)
+            return {'signature': signature, 'sha256': digest, 'latest': target, 'stored': True}
+        finally:
+            os.remove(staged)
+
+    def prune(self, relative, now):
+        """Keeps the newest keep_last versions and the newest version of each of the last keep_daily days."""
+        version_dir = os.path.join(self.backup_dir, relative)
+        versions = sorted((name for name in os.listdir(version_dir) if name.endswith('.gz')), reverse=True)
+        keep = set(versions[:self.keep_last])
+        cutoff = (now - datetime.timedelta(days=self.keep_daily)).strftime('%Y%m%d')
+        days_seen = set()
+        for name in versions:
+            day = name[:8]
+            if day >= cutoff and day not in days_seen:
+                days_seen.add(day)
+                keep.add(name)
+        removed = 0
+        for name in versions:
+            if name not in keep:
+                os.remove(os.path.join(version_dir, name))
+                removed += 1
+        return removed
+
+    def run(self):
+        """Backs up whatever changed since the last run. Returns counts for the log and /backup."""
+        now = datetime.datetime.now()
+        timestamp = now.strftime(TIMESTAMP)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        manifest = self.load_manifest()
+        result = {'checked': 0, 'stored': 0, 'unchanged': 0, 'pruned': 0, 'failed': 0, 'bytes': 0}
+        seen = set()
+        dirty = False
+        for relative, path in self.files():
+            seen.add(relative)
+            result['checked'] += 1
+            try:
+                entry = self.backup_file(relative, path, manifest.get(relative), timestamp)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Backing up {relative} failed: {e}")
+                result['failed'] += 1
+                continue
+            if entry.pop('stored'):
+                result['stored'] += 1
+                result['bytes'] += os.path.getsize(entry['latest'])
+                result['pruned'] += self.prune(relative, now)
+            else:
+                result['unchanged'] += 1
+            if manifest.get(relative) != entry:
+                manifest[relative] = entry
+                dirty = True
+        # Files that were deleted keep their versions, but no longer need a signature
+        for relative in set(manifest) - seen:
+            if manifest[relative].pop('signature', None) is not None:
+                dirty = True
+        if dirty:
+            self.save_manifest(manifest)
+        if result['stored'] or result['failed']:
+            logger.info(f"Backup: {result}")
+        return result
@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+from services.logs import get_logger
+
+logger = get_logger('Badges')
+
+BADGE_DIRECTORY = '../.github/badges'
+
+def badge_url(label, message, color='blue'):
+    return f'https://img.shields.io/badge/{label}-{str(message).replace("%", "%25")}-{color}'
+
+def write_atomic(path, text):
+    """Writes through a temp file in the same directory and renames it over the old one."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+class BadgeService:
+    """The README badge files: <name>.txt holds the value, <name>_badge_url.txt the shields.io URL.
+
+    Cogs push values as they change; a file is only rewritten when its text
+    differs from what is already on disk, so the badges workflow sees no churn.
+    """
+    def __init__(self, directory=BADGE_DIRECTORY):
+        self.directory = directory
+        self.written = {}  # filename: text on disk
+        self.writes = 0
+
+    def write(self, filename, text):
+        if filename not in self.written:
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    self.written[filename] = f.read()
+            except FileNotFoundError:
+                self.written[filename] = None
+        if self.written[filename] == text:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(os.path.join(self.directory, filename), text)
+        self.written[filename] = text
+        self.writes += 1
+        return True
+
+    def set(self, name, value, label, color='blue'):
+        """Updates a badge, returns True if anything was written."""
+        try:
+            changed = self.write(f'{name}.txt', str(value))
+            return self.write(f'{name}_badge_url.txt', badge_url(label, value, color)) or changed
+        except OSError as e:
+            logger.error(f"Couldn't write the {name} badge: {e}")
+            return False
+
+badges = BadgeService()
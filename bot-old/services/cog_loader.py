@@ -0,0 +1,156 @@
+import ast
+import asyncio
+import importlib
+import logging
+import os
+import time
+
+from services.import_audit import ImportAudit, current_cog, max_rss_kb
+
+logger = logging.getLogger('CogLoader')
+
+# A cog declares what must be loaded before it with a module-level
+#     COG_DEPENDENCIES = ['commands.main.anime.anilist']
+# '*' means "after every other cog" (used by DocGenerator, which reads all of them).
+DEPENDENCIES_NAME = 'COG_DEPENDENCIES'
+
+def discover_cogs(root_dir):
+    """Maps each cog module under root_dir to its file path."""
+    cogs = {}
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('__'))
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                path = os.path.join(dirpath, filename)
+                cogs[path.replace(os.sep, ".")[:-3]] = path
+    return cogs
+
+def read_declarations(path, root_package):
+    """Reads COG_DEPENDENCIES and the top-level third-party imports of a cog without importing it."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    dependencies = []
+    imports = set()
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == DEPENDENCIES_NAME for target in node.targets):
+            dependencies = list(ast.literal_eval(node.value))
+        elif isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.add(node.module)
+    # Never pre-import other cogs, that would run their module code twice
+    imports = {name for name in imports if name.split('.')[0] != root_package}
+    return dependencies, imports
+
+def prefetch_imports(names):
+    """Imports a cog's dependencies in a worker thread so the event loop only runs the cog itself."""
+    for name in sorted(names):
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # The cog's own import will raise the real error
+
+def order_cogs(graph):
+    """Topologically sorts the graph, returning (order, cogs stuck in a cycle)."""
+    remaining = {module: set(dependencies) for module, dependencies in graph.items()}
+    order = []
+    while True:
+        ready = sorted(module for module, dependencies in remaining.items() if not dependencies)
+        if not ready:
+            break
+        for module in ready:
+            order.append(module)
+            del remaining[module]
+        for dependencies in remaining.values():
+            dependencies.difference_update(ready)
+    return order, sorted(remaining)
+
+async def load_cogs(bot, root_dir):
+    """Loads every cog under root_dir, concurrently where the dependency graph allows.
+
+    Returns a report: {'cogs': {module: entry}, 'loaded': int, 'failed': [modules], 'elapsed_ms': float,
+    'imports': ImportAudit, 'max_rss_kb': int} where each entry records its dependencies, status, error,
+    and how long its third-party imports (import_ms) and its own module code plus setup() (setup_ms) took.
+    """
+    started = time.perf_counter()
+    root_package = os.path.normpath(root_dir).split(os.sep)[0]
+    cogs = discover_cogs(root_dir)
+    logger.debug(f"Loading {len(cogs)} cogs from: {root_dir}")
+
+    entries = {}
+    graph = {}
+    imports = {}
+    for module, path in cogs.items():
+        entry = entries[module] = {'dependencies': [], 'status': 'pending', 'error': None, 'import_ms': 0.0, 'setup_ms': 0.0}
+        try:
+            dependencies, imports[module] = read_declarations(path, root_package)
+        except (SyntaxError, ValueError) as e:
+            entry['status'], entry['error'] = 'failed', f"Could not read cog: {e}"
+            continue
+        entry['dependencies'] = dependencies
+        graph[module] = dependencies
+
+    # Expand '*' to every cog that doesn't itself wait for everything
+    last = {module for module, dependencies in graph.items() if '*' in dependencies}
+    for module in graph:
+        if module in last:
+            graph[module] = sorted((set(graph[module]) - {'*'}) | (set(graph) - last))
+    for module, dependencies in graph.items():
+        missing = [dependency for dependency in dependencies if dependency not in graph]
+        if missing:
+            entries[module]['error'] = f"Missing dependencies: {', '.join(missing)}"
+    graph = {module: [d for d in dependencies if d in graph] for module, dependencies in graph.items()}
+
+    order, cyclic = order_cogs(graph)
+    for module in cyclic:
+        entries[module]['status'], entries[module]['error'] = 'failed', "Dependency cycle"
+
+    tasks = {}
+
+    async def load(module):
+        current_cog.set(module)
+        entry = entries[module]
+        if entry['error']:
+            entry['status'] = 'failed'
+            return False
+        for dependency in graph[module]:
+            # '*' only orders the load, it doesn't need every other cog to have succeeded
+            if not await tasks[dependency] and module not in last:
+                entry['status'], entry['error'] = 'skipped', f"Dependency {dependency} failed to load"
+                return False
+
+        start = time.perf_counter()
+        await asyncio.to_thread(prefetch_imports, imports[module])
+        entry['import_ms'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        try:
+            await bot.load_extension(module)
+        except Exception as e:
+            entry['setup_ms'] = (time.perf_counter() - start) * 1000
+            entry['status'], entry['error'] = 'failed', f"{type(e).__name__}: {e.__cause__ or e}"
+            logger.error(f"Failed to load Cog: {module}\n{entry['error']}")
+            return False
+        entry['setup_ms'] = (time.perf_counter() - start) * 1000
+        entry['status'] = 'loaded'
+        logger.debug(f"Loaded Cog: {module} (imports {entry['import_ms']:.0f}ms, setup {entry['setup_ms']:.0f}ms)")
+        return True
+
+    audit = ImportAudit()
+    with audit:
+        for module in order:
+            tasks[module] = asyncio.create_task(load(module))
+        await asyncio.gather(*tasks.values())
+
+    report = {
+        'cogs': entries,
+        'loaded': sum(1 for entry in entries.values() if entry['status'] == 'loaded'),
+        'failed': sorted(module for module, entry in entries.items() if entry['status'] != 'loaded'),
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+        'imports': audit,
+        'max_rss_kb': max_rss_kb(),
+    }
+    logger.info(f"Loaded {report['loaded']}/{len(entries)} cogs in {report['elapsed_ms']:.0f}ms, {len(audit.records)} modules imported")
+    for module in report['failed']:
+        logger.error(f"Cog {module} {entries[module]['status']}: {entries[module]['error']}")
+    return report
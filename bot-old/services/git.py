@@ -0,0 +1,96 @@
+import asyncio
+import os
+
+from services.logs import get_logger
+
+logger = get_logger('Git')
+
+DEFAULT_TIMEOUT = 60
+NETWORK_TIMEOUT = 300  # pull and push
+
+class GitError(Exception):
+    def __init__(self, args, returncode, stderr):
+        self.command = args[0] if args else ''
+        self.returncode = returncode
+        self.stderr = stderr
+        # Only the subcommand, the rest can hold a tokenized remote URL
+        super().__init__(f"git {self.command} exited with {returncode}: {stderr.strip()}")
+
+class GitRepo:
+    """Runs git without blocking the event loop.
+
+    Commands go through asyncio.create_subprocess_exec, one at a time per repo
+    (git's own index lock would fail a second one anyway), and are killed
+    after a timeout. HEAD and the commit count are cached until HEAD or the
+    branch it points to changes on disk, which a few stat() calls detect.
+    """
+    def __init__(self, path='.'):
+        self.path = os.path.abspath(path)
+        self.lock = asyncio.Lock()
+        self.git_dir = None
+        self.version_key = None
+        self.version_value = None
+
+    async def run(self, *args, timeout=DEFAULT_TIMEOUT, check=True):
+        """Returns (returncode, stdout, stderr) as text; raises GitError on failure when check is set."""
+        async with self.lock:
+            process = await asyncio.create_subprocess_exec(
+                'git', *args, cwd=self.path,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                env={**os.environ, 'GIT_TERMINAL_PROMPT': '0'},  # Fail instead of waiting for credentials
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                logger.warning(f"git {args[0]} killed after {timeout}s")
+                raise GitError(args, None, f"timed out after {timeout}s")
+        stdout, stderr = stdout.decode('utf-8', errors='replace'), stderr.decode('utf-8', errors='replace')
+        if check and process.returncode != 0:
+            raise GitError(args, process.returncode, stderr)
+        return process.returncode, stdout, stderr
+
+    async def pull(self, *args):
+        return await self.run('pull', *args, timeout=NETWORK_TIMEOUT, check=False)
+
+    async def push(self, *args):
+        return await self.run('push', *args, timeout=NETWORK_TIMEOUT)
+
+    def head_key(self):
+        """mtimes of HEAD, the ref it points to and packed-refs; any commit, pull or checkout changes one."""
+        key = []
+        head_path = os.path.join(self.git_dir, 'HEAD')
+        with open(head_path) as f:
+            head = f.read().strip()
+        paths = [head_path, os.path.join(self.git_dir, 'packed-refs')]
+        if head.startswith('ref: '):
+            paths.append(os.path.join(self.git_dir, head[5:]))
+        for path in paths:
+            try:
+                key.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                key.append(None)
+        return head, tuple(key)
+
+    async def version(self):
+        """(commit count, HEAD hash), from the cache while HEAD hasn't moved."""
+        if self.git_dir is None:
+            _, git_dir, _ = await self.run('rev-parse', '--git-dir')
+            self.git_dir = os.path.join(self.path, git_dir.strip())
+        key = self.head_key()
+        if key != self.version_key:
+            _, count, _ = await self.run('rev-list', '--count', 'HEAD')
+            _, head, _ = await self.run('rev-parse', 'HEAD')
+            self.version_key = key
+            self.version_value = (int(count), head.strip())
+        return self.version_value
+
+_repos = {}
+
+def git_repo(path='.'):
+    """The shared GitRepo for a directory, so every cog uses the same lock."""
+    path = os.path.abspath(path)
+    if path not in _repos:
+        _repos[path] = GitRepo(path)
+    return _repos[path]
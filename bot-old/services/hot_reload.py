@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Fall back to polling file mtimes
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger('HotReload')
+
+# State handoff protocol: a cog may define
+#     def export_state(self) -> dict      called on the old instance before it is unloaded
+#     def import_state(self, state)       called on the new instance right after it is loaded
+# to carry in-memory state (queues, accumulators, running votes) across a reload.
+
+async def reload_with_state(bot, module):
+    """Reloads (or first loads) an extension, handing exported cog state to the new instances."""
+    states = {}
+    for name, cog in list(bot.cogs.items()):
+        if cog.__module__ == module and hasattr(cog, 'export_state'):
+            try:
+                states[name] = cog.export_state()
+            except Exception as e:
+                logger.error(f"export_state failed for {name}: {e}")
+
+    try:
+        if module in bot.extensions:
+            await bot.reload_extension(module)
+        else:
+            await bot.load_extension(module)
+    finally:
+        # On a failed reload discord.py restores the old module, which still wants its state back
+        for name, state in states.items():
+            cog = bot.get_cog(name)
+            if cog is not None and hasattr(cog, 'import_state'):
+                try:
+                    cog.import_state(state)
+                except Exception as e:
+                    logger.error(f"import_state failed for {name}: {e}")
+    logger.info(f"Reloaded {module} ({len(states)} cog states handed over)")
+
+def module_for_path(path):
+    """Turns ./commands/main/fun/Random.py into commands.main.fun.Random."""
+    relative = os.path.relpath(path)
+    if not relative.endswith('.py') or relative.startswith('..'):
+        return None
+    return relative[:-3].replace(os.sep, '.')
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, reloader):
+        self.reloader = reloader
+
+    def on_any_event(self, event):
+        # Ignore open/close events, importing the module during a reload would retrigger it
+        if event.is_directory or event.event_type not in ('created', 'modified', 'moved', 'deleted'):
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and path.endswith('.py'):
+                self.reloader.loop.call_soon_threadsafe(self.reloader.changed, path)
+
+class HotReloader:
+    """Watches the cog directory and reloads extensions whose files change.
+
+    Uses watchdog (inotify on Linux) when it is installed and polls file mtimes
+    otherwise. Changes are debounced so an editor writing several times, or a
+    git pull touching many files, results in one reload per module.
+    """
+    def __init__(self, bot, root_dir='commands', poll_interval=1.0, debounce=0.5):
+        self.bot = bot
+        self.root_dir = root_dir
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.loop = None
+        self.pending = set()
+        self.observer = None
+        self.task = None
+        self.flush_handle = None
+        self.mtimes = {}
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(_ChangeHandler(self), self.root_dir, recursive=True)
+            self.observer.start()
+            logger.info(f"Watching {self.root_dir} for changes (watchdog)")
+        else:
+            self.mtimes = self.scan()
+            self.task = self.loop.create_task(self.poll())
+            logger.info(f"Watching {self.root_dir} for changes (polling every {self.poll_interval}s)")
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+    def scan(self):
+        mtimes = {}
+        for dirpath, dirnames, filenames in os.walk(self.root_dir):
+            dirnames[:] = [d for d in dirnames if not d.startswith('__')]
+            for filename in filenames:
+                if filename.endswith('.py'):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        mtimes[path] = os.stat(path).st_mtime_ns
+                    except FileNotFoundError:
+                        pass
+        return mtimes
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(self.scan)
+            for path in current.keys() | self.mtimes.keys():
+                if current.get(path) != self.mtimes.get(path):
+                    self.changed(path)
+            self.mtimes = current
+
+    def changed(self, path):
+        module = module_for_path(path)
+        if module is None:
+            return
+        self.pending.add((module, path))
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+        self.flush_handle = self.loop.call_later(self.debounce, lambda: self.loop.create_task(self.flush()))
+
+    async def flush(self):
+        self.flush_handle = None
+        pending, self.pending = self.pending, set()
+        for module, path in sorted(pending):
+            try:
+                if not os.path.exists(path):
+                    if module in self.bot.extensions:
+                        await self.bot.unload_extension(module)
+                        logger.info(f"Unloaded {module} (file removed)")
+                    continue
+                await reload_with_state(self.bot, module)
+            except Exception as e:
+                logger.error(f"Hot reload of {module} failed: {e}")
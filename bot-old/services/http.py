@@ -0,0 +1,105 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+
+from services.logs import get_logger
+
+logger = get_logger('HTTPService')
+
+class HTTPService:
+    """One pooled aiohttp session per upstream host, shared by every cog.
+
+    The bot creates a single instance as ``bot.http_service`` and closes it on
+    shutdown. Cogs take it from the bot in ``__init__`` instead of opening
+    their own sessions, so tests can hand them an instance whose
+    ``host_overrides`` point at a local mock server.
+    """
+    def __init__(self, limit_per_host=10, dns_cache_ttl=300, keepalive_timeout=30, timeout=30, host_overrides=None):
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.host_overrides = host_overrides or {}  # host: replacement base url, e.g. 'http://127.0.0.1:8080'
+        self.sessions = {}
+        self.stats = {}  # host: {'requests', 'errors', 'total_ms', 'max_ms'}
+        self.closed = False
+
+    def resolve(self, url):
+        """Returns (host, url) with the url rewritten if its host is overridden."""
+        parts = urlsplit(url)
+        host = parts.hostname
+        override = self.host_overrides.get(host)
+        if override:
+            base = urlsplit(override)
+            url = urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+        return host, url
+
+    def session_for(self, host):
+        if self.closed:
+            raise RuntimeError("HTTPService is closed")
+        session = self.sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self.sessions[host] = session
+            self.stats.setdefault(host, {'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        return session
+
+    @asynccontextmanager
+    async def request(self, method, url, **kwargs):
+        """``async with http_service.request('GET', url) as response:`` on the host's pooled session."""
+        host, url = self.resolve(url)
+        session = self.session_for(host)
+        stats = self.stats[host]
+        stats['requests'] += 1
+        status = None
+        start = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                status = response.status
+                if response.status >= 500 or response.status == 429:
+                    stats['errors'] += 1
+                yield response
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            stats['errors'] += 1
+            status = type(e).__name__
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            stats['total_ms'] += elapsed
+            stats['max_ms'] = max(stats['max_ms'], elapsed)
+            # Logged from the caller's task, so the line carries the command's trace id
+            logger.debug(f"{method} {host} {status} {elapsed:.0f}ms",
+                         extra={'fields': {'method': method, 'host': host, 'status': status, 'ms': round(elapsed, 1)}})
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def report(self):
+        """Per-host request counts, error counts and latency in milliseconds."""
+        return {
+            host: {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'avg_ms': stats['total_ms'] / stats['requests'] if stats['requests'] else 0.0,
+                'max_ms': stats['max_ms'],
+            }
+            for host, stats in self.stats.items()
+        }
+
+    async def close(self):
+        self.closed = True
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(*(session.close() for session in sessions if not session.closed))
+        logger.info(f"Closed {len(sessions)} HTTP sessions.")
@@ -0,0 +1,118 @@
+import contextvars
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# The cog whose load is running, asyncio.to_thread copies it into the prefetch threads
+current_cog = contextvars.ContextVar('current_cog', default=None)
+
+def max_rss_kb():
+    """Peak resident memory of the process in KB, or None where it can't be read."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # macOS reports bytes
+
+class _TimedLoader:
+    """Wraps a module's loader for the duration of its import and records how long it took."""
+    def __init__(self, loader, audit):
+        self.loader = loader
+        self.audit = audit
+        self.create_us = 0
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        start = time.perf_counter()
+        try:
+            create = getattr(self.loader, 'create_module', None)
+            return create(spec) if create else None
+        finally:
+            self.create_us = (time.perf_counter() - start) * 1e6
+
+    def exec_module(self, module):
+        # Put the real loader back so the module looks exactly as it would without the audit
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        self.audit.enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.audit.exit(module.__name__, self.create_us)
+
+class ImportAudit:
+    """Records `python -X importtime`-style costs for every module imported while installed.
+
+    Each record is (name, self_us, cumulative_us, depth, cog): self time excludes
+    the modules it imported in turn, depth is the nesting level, and cog is the
+    cog being loaded when the import happened. Modules that were already imported
+    cost nothing and don't appear.
+    """
+    def __init__(self):
+        self.records = []
+        self.local = threading.local()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def enter(self):
+        stack = self.local.__dict__.setdefault('stack', [])
+        # [start, time spent in nested imports]
+        stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, name, create_us):
+        stack = self.local.stack
+        start, nested = stack.pop()
+        cumulative = (time.perf_counter() - start) * 1e6 + create_us
+        if stack:
+            stack[-1][1] += cumulative
+        self.records.append((name, cumulative - nested, cumulative, len(stack), current_cog.get()))
+
+    def by_cog(self):
+        """Total import time per cog in microseconds, counting only top-level imports."""
+        totals = {}
+        for name, self_us, cumulative_us, depth, cog in self.records:
+            if depth == 0:
+                totals[cog] = totals.get(cog, 0) + cumulative_us
+        return totals
+
+    def slowest(self, count=10):
+        """The modules with the largest self time."""
+        return sorted(self.records, key=lambda record: record[1], reverse=True)[:count]
+
+    def format(self):
+        """Renders the records the way `python -X importtime` prints them, grouped by cog."""
+        lines = ["import time: self [us] | cumulative | imported package"]
+        # Records are appended when a module finishes, so children come before their parent
+        for name, self_us, cumulative_us, depth, cog in self.records:
+            lines.append(f"import time: {self_us:>9.0f} | {cumulative_us:>10.0f} | {'  ' * depth}{name}  [{cog or '-'}]")
+        return "\n".join(lines)
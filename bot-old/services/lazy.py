@@ -0,0 +1,21 @@
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """Returns a module whose code only runs the first time one of its attributes is used.
+
+    For heavy dependencies a cog only needs in a rarely used command, e.g.
+        github = lazy_import('github')
+    costs nothing at cog load and imports PyGithub when github.Github is first touched.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
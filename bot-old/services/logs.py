@@ -0,0 +1,257 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from services.trace import trace_id
+
+LOG_DIR = './logs'
+FORMAT = '%(asctime)s:%(levelname)s:%(name)s: %(message)s'
+_STOP = object()
+
+class TextFormatter(logging.Formatter):
+    """The usual cog log line, with the trace id appended when there is one."""
+    def __init__(self):
+        super().__init__(FORMAT)
+
+    def formatMessage(self, record):
+        # Before any traceback, so the trace id stays on the line with the timestamp
+        line = super().formatMessage(record)
+        if record.trace_id:
+            line += f" [trace={record.trace_id}]"
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, and trace, fields and exc when set.
+
+    Extra structured data goes in `extra={'fields': {...}}`.
+    """
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.trace_id:
+            entry['trace'] = record.trace_id
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry['fields'] = fields
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+FORMATTERS = {'text': TextFormatter, 'json': JsonFormatter}
+
+class _LogFile:
+    """A size-rotated log file. Only the writer thread touches it."""
+    def __init__(self, path, max_bytes, backup_count):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.stream = None
+        self.size = 0
+
+    def open(self):
+        # Every run starts a fresh file like the old mode='w' handlers, but the last run is kept as .1
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            self.rotate()
+        self.stream = open(self.path, 'a', encoding='utf-8')
+        self.size = 0
+
+    def rotate(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if not self.backup_count:
+            open(self.path, 'w').close()
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def write(self, text):
+        if self.stream is None:
+            self.open()
+        elif self.max_bytes and self.size + len(text) > self.max_bytes:  # Characters, close enough to bytes
+            self.rotate()
+            self.open()
+        self.stream.write(text)
+        self.size += len(text)
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+class _Limit:
+    """Keeps one in `sample` records, then at most `per_second` of those (bursts up to `burst`)."""
+    def __init__(self, sample=1, per_second=None, burst=None):
+        self.sample = sample
+        self.count = 0
+        self.rate = per_second
+        self.capacity = burst or per_second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def allow(self):
+        self.count += 1
+        if self.sample > 1 and self.count % self.sample:
+            return False
+        if self.rate is not None:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+        return True
+
+class PipelineHandler(logging.Handler):
+    """Hands records to the pipeline queue instead of writing them."""
+    def __init__(self, pipeline, filename):
+        super().__init__()
+        self.pipeline = pipeline
+        self.filename = filename
+
+    def emit(self, record):
+        try:
+            # Merge args now, the objects they refer to may have changed by the time the writer runs
+            record.msg = record.getMessage()
+            record.args = None
+            # Read in the emitting task or thread, the writer thread has its own context
+            record.trace_id = trace_id.get()
+            self.pipeline.submit(self.filename, record)
+        except Exception:
+            self.handleError(record)
+
+class LogPipeline:
+    """One background thread writing every cog's log file.
+
+    Loggers only put records on a bounded queue, so logging never touches the
+    disk from the event loop and never blocks it: when the queue is full the
+    record is dropped and counted. The writer drains the queue in batches and
+    flushes each file at most once per flush_interval. Hot loops can have
+    their DEBUG/INFO records sampled or rate limited per logger, warnings and
+    errors always go through. Lines are plain text, or JSON objects carrying
+    the trace id after set_format('json').
+    """
+    def __init__(self, log_dir=LOG_DIR, max_bytes=5 * 1024 * 1024, backup_count=3, queue_size=10000, batch_size=500, flush_interval=1.0):
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue(queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.formatter = TextFormatter()
+        self.files = {}  # filename: _LogFile
+        self.limits = {}  # logger name: _Limit
+        self.stats = {'written': 0, 'dropped': 0, 'suppressed': 0, 'batches': 0, 'flushes': 0}
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            os.makedirs(self.log_dir, exist_ok=True)
+            self.thread = threading.Thread(target=self.run, name='LogPipeline', daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        self.queue.put(_STOP)  # May wait for room, the writer is still draining
+        thread.join(timeout)
+
+    def set_format(self, name):
+        """Switches every log file between 'text' and 'json' lines."""
+        self.formatter = FORMATTERS[name]()
+
+    def limit(self, name, sample=1, per_second=None, burst=None):
+        """Samples and/or rate limits the records below WARNING of one logger."""
+        self.limits[name] = _Limit(sample, per_second, burst)
+
+    def submit(self, filename, record):
+        limit = self.limits.get(record.name)
+        if limit is not None and record.levelno < logging.WARNING and not limit.allow():
+            self.stats['suppressed'] += 1
+            return
+        try:
+            self.queue.put_nowait((filename, record))
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def run(self):
+        dirty = set()
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            timeout = max(0, self.flush_interval - (time.monotonic() - last_flush)) if dirty else None
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self.stats['batches'] += 1
+
+            for item in batch:
+                if item is _STOP:
+                    running = False
+                    continue
+                filename, record = item
+                try:
+                    text = self.formatter.format(record) + '\n'
+                    log_file = self.files.get(filename)
+                    if log_file is None:
+                        log_file = self.files[filename] = _LogFile(os.path.join(self.log_dir, filename), self.max_bytes, self.backup_count)
+                    log_file.write(text)
+                    dirty.add(log_file)
+                    self.stats['written'] += 1
+                except Exception:
+                    self.stats['dropped'] += 1
+
+            if dirty and (not running or time.monotonic() - last_flush >= self.flush_interval):
+                for log_file in dirty:
+                    log_file.flush()
+                dirty.clear()
+                last_flush = time.monotonic()
+                self.stats['flushes'] += 1
+
+        for log_file in self.files.values():
+            log_file.close()
+
+pipeline = LogPipeline()
+
+def get_logger(name, filename=None, sample=1, per_second=None, burst=None):
+    """Returns a DEBUG logger writing to ./logs/<filename> (default '<name>.log') through the pipeline.
+
+    Safe to call again on reload, the logger keeps a single handler.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    if not any(isinstance(handler, PipelineHandler) for handler in logger.handlers):
+        logger.addHandler(PipelineHandler(pipeline, filename or f'{name}.log'))
+    logger.propagate = False
+    if sample > 1 or per_second is not None:
+        pipeline.limit(name, sample, per_second, burst)
+    pipeline.start()
+    return logger
@@ -0,0 +1,107 @@
+import asyncio
+import datetime
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from services.logs import get_logger
+
+logger = get_logger('LoopWatchdog')
+
+COMMANDS_DIR = os.sep + 'commands' + os.sep
+
+def attribute(stack):
+    """Finds the cog and function a stack was running in: the outermost frame inside commands/."""
+    for frame in stack:
+        if COMMANDS_DIR in frame.filename:
+            return os.path.splitext(os.path.basename(frame.filename))[0], frame.name
+    return None, None
+
+class LoopWatchdog:
+    """Measures event-loop lag continuously and catches whatever blocks the loop.
+
+    A heartbeat task on the loop sleeps for `interval` and records how late it
+    woke up. A watcher thread checks the heartbeat; once it is more than
+    `threshold` overdue it takes the loop thread's stack, so the code that
+    is blocking (synchronous SQLite, subprocess, file I/O) is captured while
+    it runs. When the loop catches up the stall is recorded with that stack,
+    attributed to the cog file and function it came from. drain() hands the
+    lag summary and stalls since the last call to LatencyCog for its DB.
+    """
+    def __init__(self, interval=0.1, threshold=0.25, on_lag=None, history=50):
+        self.interval = interval
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self.stalls = deque(maxlen=history)  # Most recent, for display
+        self.pending = []  # Not yet drained
+        self.beat = None
+        self.capture = None  # (beat, stack) taken by the watcher thread
+        self.loop_thread_id = None
+        self.window = {'max': 0.0, 'total': 0.0, 'samples': 0}
+        self.task = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.stopped.clear()
+        self.task = asyncio.get_running_loop().create_task(self.heartbeat())
+        self.thread = threading.Thread(target=self.watch, name='LoopWatchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            beat = self.beat = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.window['max'] = max(self.window['max'], lag)
+            self.window['total'] += lag
+            self.window['samples'] += 1
+            if self.on_lag is not None:
+                self.on_lag(lag)
+            if lag >= self.threshold:
+                capture = self.capture
+                self.record(lag, capture[1] if capture and capture[0] == beat else None)
+
+    def watch(self):
+        while not self.stopped.wait(self.interval / 2):
+            beat = self.beat
+            if beat is None or (self.capture and self.capture[0] == beat):
+                continue
+            if time.monotonic() - beat > self.interval + self.threshold:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is not None:
+                    self.capture = (beat, traceback.extract_stack(frame))
+
+    def record(self, lag, stack):
+        cog, function = attribute(stack) if stack else (None, None)
+        where = f"{os.path.basename(stack[-1].filename)}:{stack[-1].lineno} in {stack[-1].name}" if stack else None
+        stall = {
+            'timestamp': datetime.datetime.now(),
+            'duration': lag,
+            'cog': cog,
+            'function': function,
+            'location': where,
+            'stack': "".join(traceback.format_list(stack)) if stack else None,
+        }
+        self.stalls.append(stall)
+        self.pending.append(stall)
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms in {cog or 'unknown cog'}.{function or '?'} at {where}\n{stall['stack'] or ''}")
+
+    def drain(self):
+        """Returns {'max_lag', 'avg_lag', 'stalls'} since the last call and starts a new window."""
+        window, self.window = self.window, {'max': 0.0, 'total': 0.0, 'samples': 0}
+        stalls, self.pending = self.pending, []
+        average = window['total'] / window['samples'] if window['samples'] else 0.0
+        return {'max_lag': window['max'], 'avg_lag': average, 'stalls': stalls}
@@ -0,0 +1,186 @@
+import time
+
+from aiohttp import web
+
+from services.logs import get_logger
+
+logger = get_logger('Metrics')
+
+# Upper bounds in seconds, like a Prometheus histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def samples(self, name, labels):
+        """Prometheus text lines for this histogram (cumulative buckets, sum, count)."""
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+class CommandStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+class Metrics:
+    """In-memory command metrics: latency histograms, errors and concurrency per command and cog.
+
+    start() and finish() are plain methods, so the numbers can be produced and
+    checked without Discord; install() wires them to the bot's invoke hooks and
+    app command events. Event-loop lag comes in through observe_lag(), fed by
+    services/loop_watchdog.py.
+    """
+    def __init__(self):
+        self.commands = {}  # (cog, command, kind): CommandStats
+        self.lag = Histogram(LAG_BUCKETS)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.started_at = time.time()
+
+    def start(self, cog, command, kind='prefix'):
+        """Marks a command as running, returns the token to hand to finish()."""
+        key = (cog or 'none', command, kind)
+        stats = self.commands.get(key)
+        if stats is None:
+            stats = self.commands[key] = CommandStats()
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        return key, time.perf_counter()
+
+    def finish(self, token, failed=False):
+        key, started = token
+        stats = self.commands[key]
+        stats.in_flight -= 1
+        stats.latency.observe(time.perf_counter() - started)
+        if failed:
+            stats.errors += 1
+
+    def observe_lag(self, lag):
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.lag.observe(lag)
+
+    def install(self, bot):
+        """Hooks prefix commands (before/after invoke) and slash commands (check, completion, errors)."""
+        @bot.before_invoke
+        async def before_invoke(ctx):
+            ctx.metrics_token = self.start(ctx.cog.qualified_name if ctx.cog else None, ctx.command.qualified_name)
+
+        @bot.after_invoke
+        async def after_invoke(ctx):
+            token = getattr(ctx, 'metrics_token', None)
+            if token is not None:
+                self.finish(token, failed=ctx.command_failed)
+
+        tree = bot.tree
+        interaction_check = tree.interaction_check
+        on_error = tree.on_error
+
+        async def check(interaction):
+            allowed = await interaction_check(interaction)
+            command = interaction.command
+            if allowed and command is not None:
+                cog = command.binding.qualified_name if getattr(command, 'binding', None) else None
+                interaction.extras['metrics_token'] = self.start(cog, command.qualified_name, 'slash')
+            return allowed
+
+        async def error(interaction, exception):
+            token = interaction.extras.pop('metrics_token', None)
+            if token is not None:
+                self.finish(token, failed=True)
+            await on_error(interaction, exception)
+
+        tree.interaction_check = check
+        tree.on_error = error
+
+        @bot.listen('on_app_command_completion')
+        async def app_command_completion(interaction, command):
+            token = interaction.extras.pop('metrics_token', None)
+            if token is not None:
+                self.finish(token)
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP bot_command_duration_seconds Time from invoke to completion.',
+            '# TYPE bot_command_duration_seconds histogram',
+        ]
+        for (cog, command, kind), stats in sorted(self.commands.items()):
+            lines += stats.latency.samples('bot_command_duration_seconds', f'cog="{cog}",command="{command}",kind="{kind}"')
+        for name, kind, help_text, attribute in (
+            ('bot_command_errors_total', 'counter', 'Invocations that raised.', 'errors'),
+            ('bot_command_in_flight', 'gauge', 'Invocations running right now.', 'in_flight'),
+            ('bot_command_max_in_flight', 'gauge', 'Most invocations seen running at once.', 'max_in_flight'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (cog, command, command_kind), stats in sorted(self.commands.items()):
+                lines.append(f'{name}{{cog="{cog}",command="{command}",kind="{command_kind}"}} {getattr(stats, attribute)}')
+        lines += [
+            '# HELP bot_event_loop_lag_seconds How late the event loop ran a timer.',
+            '# TYPE bot_event_loop_lag_seconds histogram',
+            *self.lag.samples('bot_event_loop_lag_seconds', 'loop="main"'),
+            '# TYPE bot_event_loop_lag_max_seconds gauge',
+            f'bot_event_loop_lag_max_seconds {self.max_lag:.6f}',
+            '# TYPE bot_uptime_seconds gauge',
+            f'bot_uptime_seconds {time.time() - self.started_at:.0f}',
+        ]
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves GET /metrics on a local port."""
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def handle(self, request):
+        return web.Response(text=self.metrics.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
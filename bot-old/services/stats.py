@@ -0,0 +1,148 @@
+import discord
+
+class GuildCounts:
+    def __init__(self, guild):
+        self.members = guild.member_count or 0
+        self.channels = len(guild.channels)
+        self.text_channels = len(guild.text_channels)
+        self.roles = len(guild.roles)
+        self.member_ids = {member.id for member in guild.members}
+
+class BotStats:
+    """Guild, user, channel and role totals kept current from gateway events.
+
+    Each guild's counts are stored when it becomes available and adjusted by
+    member, channel and role events, with the totals moved by the same deltas,
+    so reads are attribute lookups. Unique users are refcounted by the number
+    of guilds they share with the bot. on_ready recounts everything, which
+    also covers events missed while disconnected.
+    """
+    def __init__(self):
+        self.guilds = {}  # guild_id: GuildCounts
+        self.user_refs = {}  # user_id: guilds shared with the bot
+        self.members = 0  # Sum of member_count, like the old /stats
+        self.channels = 0
+        self.text_channels = 0
+        self.roles = 0
+
+    @property
+    def guild_count(self):
+        return len(self.guilds)
+
+    @property
+    def voice_channels(self):
+        # Everything that isn't a text channel, as /stats always counted it
+        return self.channels - self.text_channels
+
+    @property
+    def unique_users(self):
+        return len(self.user_refs)
+
+    def move(self, counts, sign):
+        self.members += sign * counts.members
+        self.channels += sign * counts.channels
+        self.text_channels += sign * counts.text_channels
+        self.roles += sign * counts.roles
+
+    def add_user(self, user_id):
+        self.user_refs[user_id] = self.user_refs.get(user_id, 0) + 1
+
+    def remove_user(self, user_id):
+        refs = self.user_refs.get(user_id, 0) - 1
+        if refs > 0:
+            self.user_refs[user_id] = refs
+        else:
+            self.user_refs.pop(user_id, None)
+
+    def add_guild(self, guild):
+        self.remove_guild(guild)  # Guilds become available again after an outage, replace their old counts
+        counts = self.guilds[guild.id] = GuildCounts(guild)
+        self.move(counts, 1)
+        for user_id in counts.member_ids:
+            self.add_user(user_id)
+
+    def remove_guild(self, guild):
+        counts = self.guilds.pop(guild.id, None)
+        if counts is None:
+            return
+        self.move(counts, -1)
+        for user_id in counts.member_ids:
+            self.remove_user(user_id)
+
+    def rebuild(self, guilds):
+        self.__init__()
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def member_joined(self, member):
+        counts = self.guilds.get(member.guild.id)
+        if counts is None or member.id in counts.member_ids:
+            return
+        counts.members += 1
+        counts.member_ids.add(member.id)
+        self.members += 1
+        self.add_user(member.id)
+
+    def member_left(self, guild_id, user_id):
+        counts = self.guilds.get(guild_id)
+        if counts is None:
+            return
+        counts.members -= 1
+        self.members -= 1
+        if user_id in counts.member_ids:
+            counts.member_ids.discard(user_id)
+            self.remove_user(user_id)
+
+    def channel_changed(self, channel, sign):
+        counts = self.guilds.get(channel.guild.id)
+        if counts is None:
+            return
+        text = 1 if isinstance(channel, discord.TextChannel) else 0
+        counts.channels += sign
+        counts.text_channels += sign * text
+        self.channels += sign
+        self.text_channels += sign * text
+
+    def role_changed(self, role, sign):
+        counts = self.guilds.get(role.guild.id)
+        if counts is None:
+            return
+        counts.roles += sign
+        self.roles += sign
+
+    def install(self, bot):
+        """Registers the listeners that keep the counts current."""
+        async def on_ready():
+            self.rebuild(bot.guilds)
+
+        async def on_guild_join(guild):
+            self.add_guild(guild)
+
+        async def on_guild_remove(guild):
+            self.remove_guild(guild)
+
+        async def on_member_join(member):
+            self.member_joined(member)
+
+        async def on_raw_member_remove(payload):
+            # The raw event also fires for members that weren't cached
+            self.member_left(payload.guild_id, payload.user.id)
+
+        async def on_guild_channel_create(channel):
+            self.channel_changed(channel, 1)
+
+        async def on_guild_channel_delete(channel):
+            self.channel_changed(channel, -1)
+
+        async def on_guild_role_create(role):
+            self.role_changed(role, 1)
+
+        async def on_guild_role_delete(role):
+            self.role_changed(role, -1)
+
+        for listener in (on_ready, on_guild_join, on_guild_remove, on_member_join, on_raw_member_remove,
+                         on_guild_channel_create, on_guild_channel_delete, on_guild_role_create, on_guild_role_delete):
+            bot.add_listener(listener)
+        # Recounts a guild that comes back after an outage; add_guild replaces its old counts, so it isn't counted twice.
+        # There is no on_guild_unavailable listener: an unavailable guild still counts, as it did with len(bot.guilds).
+        bot.add_listener(on_guild_join, 'on_guild_available')
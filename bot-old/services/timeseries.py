@@ -0,0 +1,261 @@
+import datetime
+import math
+import os
+import sqlite3
+import threading
+from array import array
+
+DEFAULT_PATH = './data/db/timeseries.db'
+MISSING = float('nan')
+
+def utc_now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def as_utc(moment):
+    """Naive datetimes are taken as local time, the way the old tables stored them."""
+    return moment.astimezone(datetime.timezone.utc)
+
+class Summary:
+    """Aggregate of the samples in a window. `slots` is how many samples the window could hold."""
+    def __init__(self, count=0, total=0.0, minimum=None, maximum=None, slots=0):
+        self.count = count
+        self.total = total
+        self.min = minimum
+        self.max = maximum
+        self.slots = slots
+
+    def add(self, count, total, minimum, maximum, slots):
+        self.count += count
+        self.total += total
+        self.slots += slots
+        if count:
+            self.min = minimum if self.min is None else min(self.min, minimum)
+            self.max = maximum if self.max is None else max(self.max, maximum)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def fraction(self):
+        """total / slots: for 0/1 samples, the share of the window that was 1 (missing samples count as 0)."""
+        return self.total / self.slots if self.slots else 0.0
+
+def summarize(values):
+    present = [value for value in values if not math.isnan(value)]
+    if not present:
+        return 0, 0.0, None, None
+    return len(present), sum(present), min(present), max(present)
+
+class TimeSeriesStore:
+    """Fixed-interval samples stored as one float32 array per series per UTC day.
+
+    Each day is a segment: a blob of 86400 / interval slots, NaN where no sample
+    was taken. Writing a sample updates its segment and that day's row in
+    daily_rollups, then the month's row in monthly_rollups. Summaries over a
+    window read the rollups of the whole days in it and only slice the
+    segments of the first and last day, so their cost grows with the number of
+    days, not samples. Retention deletes whole segments; rollups are one row
+    per day and are kept.
+
+    Methods block on SQLite; cogs call them through asyncio.to_thread.
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS segments (
+                                   series TEXT NOT NULL,
+                                   day TEXT NOT NULL,
+                                   interval INTEGER NOT NULL,
+                                   data BLOB NOT NULL,
+                                   PRIMARY KEY (series, day))''')
+            for table, bucket in (('daily_rollups', 'day'), ('monthly_rollups', 'month')):
+                self.conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                                        series TEXT NOT NULL,
+                                        {bucket} TEXT NOT NULL,
+                                        count INTEGER NOT NULL,
+                                        total REAL NOT NULL,
+                                        min REAL,
+                                        max REAL,
+                                        slots INTEGER NOT NULL,
+                                        PRIMARY KEY (series, {bucket}))''')
+            self.conn.commit()
+
+    def series(self, name, interval, retention_days):
+        return Series(self, name, interval, retention_days)
+
+_stores = {}
+
+def open_store(path=DEFAULT_PATH):
+    """One store per file, shared by every cog that writes to it."""
+    if path not in _stores:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _stores[path] = TimeSeriesStore(path)
+    return _stores[path]
+
+class Series:
+    def __init__(self, store, name, interval, retention_days):
+        if 86400 % interval:
+            raise ValueError("interval must divide a day")
+        self.store = store
+        self.name = name
+        self.interval = interval
+        self.slots_per_day = 86400 // interval
+        self.retention_days = retention_days
+        self.cache = {}  # day: array, for the segment being written
+        self.windows = []  # RollingWindows kept up to date by record()
+
+    def slot(self, moment):
+        moment = as_utc(moment)
+        seconds = moment.hour * 3600 + moment.minute * 60 + moment.second
+        return moment.date().isoformat(), seconds // self.interval
+
+    def load(self, day):
+        """The segment for a day (called with the store lock held)."""
+        if day in self.cache:
+            return self.cache[day]
+        row = self.store.conn.execute('SELECT data FROM segments WHERE series = ? AND day = ?', (self.name, day)).fetchone()
+        values = array('f')
+        if row:
+            values.frombytes(row[0])
+        else:
+            values.extend([MISSING] * self.slots_per_day)
+        return values
+
+    def write(self, day, values):
+        conn = self.store.conn
+        conn.execute('''INSERT INTO segments (series, day, interval, data) VALUES (?, ?, ?, ?)
+                        ON CONFLICT DO UPDATE SET data = excluded.data''',
+                     (self.name, day, self.interval, values.tobytes()))
+        conn.execute('''INSERT INTO daily_rollups (series, day, count, total, min, max, slots) VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT DO UPDATE SET count = excluded.count, total = excluded.total, min = excluded.min, max = excluded.max''',
+                     (self.name, day, *summarize(values), self.slots_per_day))
+        conn.execute('''INSERT INTO monthly_rollups (series, month, count, total, min, max, slots)
+                        SELECT series, substr(day, 1, 7), SUM(count), SUM(total), MIN(min), MAX(max), SUM(slots) FROM daily_rollups
+                        WHERE series = ? AND day LIKE ? GROUP BY series
+                        ON CONFLICT DO UPDATE SET count = excluded.count, total = excluded.total, min = excluded.min,
+                                                  max = excluded.max, slots = excluded.slots''',
+                     (self.name, day[:7] + '%'))
+
+    def absolute_slot(self, moment):
+        return int(as_utc(moment).timestamp()) // self.interval
+
+    def slot_time(self, absolute):
+        return datetime.datetime.fromtimestamp(absolute * self.interval, datetime.timezone.utc)
+
+    def record(self, value, when=None):
+        when = when or utc_now()
+        day, index = self.slot(when)
+        with self.store.lock:
+            values = self.load(day)
+            previous = values[index]
+            values[index] = value
+            self.cache = {day: values}  # Only the current day stays in memory
+            self.write(day, values)
+            self.store.conn.commit()
+            for window in self.windows:
+                window.add(self.absolute_slot(when), values[index], previous)
+
+    def window(self, days):
+        """A RollingWindow over the last days that record() keeps current."""
+        with self.store.lock:
+            window = RollingWindow(self, days)
+            self.windows.append(window)
+        return window
+
+    def record_many(self, samples):
+        """Writes (when, value) pairs a segment at a time, for importing the old row-per-sample tables."""
+        days = {}
+        for when, value in samples:
+            day, index = self.slot(when)
+            days.setdefault(day, []).append((index, value))
+        with self.store.lock:
+            for day, entries in days.items():
+                values = self.load(day)
+                for index, value in entries:
+                    values[index] = value
+                self.write(day, values)
+            self.store.conn.commit()
+
+    def summary(self, start, end=None):
+        """Summary of the samples from start to end (now by default)."""
+        end = as_utc(end or utc_now())
+        start = as_utc(start)
+        first_day, first_slot = self.slot(start)
+        last_day, last_slot = self.slot(end)
+        result = Summary()
+        with self.store.lock:
+            if first_day == last_day:
+                result.add(*summarize(self.load(first_day)[first_slot:last_slot + 1]), last_slot - first_slot + 1)
+                return result
+            result.add(*summarize(self.load(first_day)[first_slot:]), self.slots_per_day - first_slot)
+            result.add(*summarize(self.load(last_day)[:last_slot + 1]), last_slot + 1)
+            rows = self.store.conn.execute('''SELECT count, total, min, max, day FROM daily_rollups
+                                              WHERE series = ? AND day > ? AND day < ?''',
+                                           (self.name, first_day, last_day)).fetchall()
+        for count, total, minimum, maximum, day in rows:
+            result.add(count, total, minimum, maximum, 0)
+        # Days with no segment at all still count as empty slots
+        whole_days = (datetime.date.fromisoformat(last_day) - datetime.date.fromisoformat(first_day)).days - 1
+        result.slots += whole_days * self.slots_per_day
+        return result
+
+    def rollups(self, period='day', limit=30):
+        """[(day or month, Summary)] newest first, from the precomputed rollups."""
+        table, bucket = ('monthly_rollups', 'month') if period == 'month' else ('daily_rollups', 'day')
+        with self.store.lock:
+            rows = self.store.conn.execute(f'''SELECT {bucket}, count, total, min, max, slots FROM {table}
+                                               WHERE series = ? ORDER BY {bucket} DESC LIMIT ?''',
+                                           (self.name, limit)).fetchall()
+        return [(key, Summary(*values)) for key, *values in rows]
+
+    def prune(self, now=None):
+        """Drops the segments older than the retention period. Returns how many went."""
+        cutoff = (as_utc(now or utc_now()).date() - datetime.timedelta(days=self.retention_days)).isoformat()
+        with self.store.lock:
+            deleted = self.store.conn.execute('DELETE FROM segments WHERE series = ? AND day < ?', (self.name, cutoff)).rowcount
+            self.store.conn.commit()
+        return deleted
+
+class RollingWindow:
+    """Running count and total of a series over its last `days`, updated per sample.
+
+    Built once from summary(); after that each record() adds the new sample
+    and subtracts the slots that slid out of the window, so reading it is O(1).
+    """
+    def __init__(self, series, days):
+        self.series = series
+        self.days = days
+        self.slots = days * series.slots_per_day
+        self.reset(series.absolute_slot(utc_now()))
+
+    def reset(self, last):
+        self.last = last
+        summary = self.series.summary(self.series.slot_time(last - self.slots + 1), self.series.slot_time(last))
+        self.count = summary.count
+        self.total = summary.total
+
+    def add(self, absolute, value, previous):
+        if absolute < self.last - self.slots + 1:
+            return  # Older than the window
+        if absolute > self.last:
+            if absolute - self.last >= self.slots:
+                self.reset(absolute)  # Everything slid out, the new sample is already stored
+                return
+            # Slots last - slots + 1 .. absolute - slots leave the window
+            expired = self.series.summary(self.series.slot_time(self.last - self.slots + 1),
+                                          self.series.slot_time(absolute - self.slots))
+            self.count -= expired.count
+            self.total -= expired.total
+            self.last = absolute
+        if not math.isnan(previous):
+            self.count -= 1
+            self.total -= previous
+        self.count += 1
+        self.total += value
+
+    @property
+    def fraction(self):
+        """total / slots, as in Summary.fraction."""
+        return self.total / self.slots
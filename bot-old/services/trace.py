@@ -0,0 +1,27 @@
+import contextvars
+import logging
+
+from discord import app_commands
+
+# The id of the command invocation being handled, attached to every log record.
+# contextvars follow the invocation through awaits, tasks it creates and asyncio.to_thread,
+# so database work in a worker thread and HTTPService requests log under the same trace
+# (loop.run_in_executor does not copy it, use asyncio.to_thread).
+trace_id = contextvars.ContextVar('trace_id', default=None)
+
+def new_trace(source_id):
+    """Starts a trace for a message or interaction, named after its snowflake."""
+    value = str(source_id)
+    trace_id.set(value)
+    return value
+
+def current_trace():
+    return trace_id.get()
+
+class TracedCommandTree(app_commands.CommandTree):
+    """Starts a trace for every slash command, in the task that runs the command."""
+    async def interaction_check(self, interaction):
+        new_trace(interaction.id)
+        command = interaction.command.qualified_name if interaction.command else interaction.data.get('name')
+        logging.getLogger('Commands').debug(f"/{command} by {interaction.user.id} in {interaction.guild_id or 'DM'}")
+        return True
@@ -0,0 +1,36 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger('TreeSync')
+
+def tree_hash(tree):
+    """Hashes the payload Discord would receive for the global command tree."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get('type', 1), command['name']),
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+async def sync_tree_if_changed(tree, hash_file='./data/tree_hash.txt', force=False):
+    """Syncs global app commands only if they changed since the last successful sync.
+
+    Returns True when a sync was sent to Discord.
+    """
+    current = tree_hash(tree)
+    previous = None
+    if os.path.exists(hash_file):
+        with open(hash_file, 'r') as f:
+            previous = f.read().strip()
+
+    if current == previous and not force:
+        logger.info("Command tree unchanged, skipping sync.")
+        return False
+
+    await tree.sync()
+    os.makedirs(os.path.dirname(hash_file) or '.', exist_ok=True)
+    with open(hash_file, 'w') as f:
+        f.write(current)
+    logger.info(f"Command tree synced ({current[:12]}).")
+    return True
@@ -12,6 +12,9 @@ logger.addHandler(handler)
 logger.propagate = False
 logger.info("Template Cog Loaded. Logging started...")
 
+# Cogs that must be loaded before this one, e.g. ['commands.main.anime.anilist'] ('*' loads it last)
+COG_DEPENDENCIES = []
+
 class Template(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
@@ -1,13 +1,22 @@
 import os
+import sys
+import time
 import discord
 from discord.ext import commands
-import asyncio
 import logging
 import json
+
+# The cog loader, tree sync, trace helpers and log formatters live in the old bot's services package instead of being copied here
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot-old'))
 from shared_logging import setup_logging
+from services.trace import new_trace, TracedCommandTree
+from services.cog_loader import load_cogs
+from services.tree_sync import sync_tree_if_changed
+
+STARTED_AT = time.perf_counter()
 
-# Initialize logging
-setup_logging()
+# Initialize logging, LOG_FORMAT=json writes one JSON object per line
+setup_logging(structured=os.environ.get('LOG_FORMAT') == 'json')
 logger = logging.getLogger('main.py')
 logger.debug("------------------------------------------------------------------------")
 logger.debug("Main script Loaded. Logging started...")
@@ -24,40 +33,35 @@ def get_config():
         config = json.load(f)
     return config
 
-bot = commands.Bot(command_prefix=determine_prefix, intents=intents, owner_id=276782057412362241, case_insensitive=True)
+class Bot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cog_load_report = None
+        self.first_ready = True
 
-async def load_cogs(bot, root_dir):
-    logger.debug(f"Loading cogs from: {root_dir}")
-    tasks = []
-    num_cogs = 0
-    
-    # Load all cogs
-    for dirpath, dirnames, filenames in os.walk(root_dir):
-        for filename in filenames:
-            if filename.endswith('.py'):
-                await handle_loading(dirpath, filename, bot, tasks)
-                num_cogs += 1
+    async def setup_hook(self):
+        # Runs once per process, unlike on_ready which fires again on every gateway reconnect
+        logger.debug("Loading cogs...")
+        self.cog_load_report = await load_cogs(self, 'commands')
+        logger.info(f"Cogs loaded ({self.cog_load_report['loaded']} cogs)")
+        await sync_tree_if_changed(self.tree)
 
-    await asyncio.gather(*tasks)
-    return num_cogs
+    async def invoke(self, ctx):
+        if ctx.command is not None:
+            new_trace(ctx.message.id)
+            logger.debug(f"Command {ctx.command.qualified_name} by {ctx.author.id}")
+        await super().invoke(ctx)
 
-async def handle_loading(dirpath, filename, bot, tasks):
-    path = os.path.join(dirpath, filename)
-    module = path.replace(os.sep, ".")[:-3]
-    try:
-        task = asyncio.create_task(bot.load_extension(module))
-        tasks.append(task)
-        logger.debug(f"Loaded Cog: {module}")
-    except Exception as e:
-        logger.error(f"Failed to load Cog: {module}\n{e}")
+bot = Bot(command_prefix=determine_prefix, intents=intents, owner_id=276782057412362241, case_insensitive=True, tree_cls=TracedCommandTree)
 
 @bot.event
 async def on_ready():
     logger.debug(f"Logged in as {bot.user}")
-    logger.debug("Loading cogs...")
-    num_cogs = await load_cogs(bot, 'commands')
-    logger.info(f"Cogs loaded ({num_cogs} cogs)")
-    await bot.tree.sync()
+    if not bot.first_ready:
+        logger.info("Reconnected to the gateway.")
+        return
+    bot.first_ready = False
+    logger.info(f"Ready {time.perf_counter() - STARTED_AT:.1f}s after startup")
 
 @bot.event
 async def on_message(message):
@@ -1,69 +1,170 @@
+import atexit
 import logging
-from concurrent_log_handler import ConcurrentRotatingFileHandler
-import threading
 import queue
+import sys
+import threading
+from concurrent_log_handler import ConcurrentRotatingFileHandler
+
+# Shared with the old bot, main.py puts bot-old on sys.path before importing this module
+from services.logs import TextFormatter, JsonFormatter
+from services.trace import trace_id
 
-# Initialize a queue for logging
-log_queue = queue.Queue()
-_logging_setup_done = False  # Flag to ensure logging is setup only once
+OVERFLOW_POLICIES = ('drop_new', 'drop_oldest', 'block')
 
-# Custom logging handler that writes messages from the queue to the file
+# Instructions for the listener, sent through the queue so they apply in order with the records
+class Control:
+    def __init__(self, action):
+        self.action = action
+
+ROTATE = Control('rotate')      # Start a new file, keeping the old one as a backup
+TRUNCATE = Control('truncate')  # Empty the current file
+STOP = Control('stop')          # Write everything queued so far, then exit
+
+# Logging handler that only puts records on the queue
 class QueueHandler(logging.Handler):
-    def __init__(self, log_queue):
+    def __init__(self, log_queue, overflow='drop_new'):
         super().__init__()
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
         self.log_queue = log_queue
+        self.overflow = overflow
+        self.dropped = 0
 
     def emit(self, record):
-        self.log_queue.put(record)
+        try:
+            # Merge args now, the objects they refer to may change before the listener formats them
+            record.msg = record.getMessage()
+            record.args = None
+            record.trace_id = trace_id.get()  # The listener thread has its own context
+            self.put(record)
+        except Exception:
+            self.handleError(record)
+
+    def put(self, item):
+        if self.overflow == 'block':
+            self.log_queue.put(item)
+            return
+        try:
+            self.log_queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        if self.overflow == 'drop_oldest':
+            # Look at the head and pop it under the queue's own lock, so the listener can't move it in between
+            with self.log_queue.mutex:
+                pending = self.log_queue.queue
+                if pending and isinstance(pending[0], Control):
+                    # Never lose a control message or reorder it, drop the new record instead
+                    self.dropped += 1
+                    return
+                if pending:
+                    pending.popleft()
+                    self.log_queue.not_full.notify()
+                    self.dropped += 1
+            try:
+                self.log_queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+        self.dropped += 1
 
-# Custom logging listener that processes messages from the queue
+# Thread that writes queued records to the file
 class QueueListener(threading.Thread):
     def __init__(self, log_queue, handler):
-        super().__init__()
+        super().__init__(name='QueueListener', daemon=True)
         self.log_queue = log_queue
         self.handler = handler
-        self.daemon = True
-        self.start()
+        self.written = 0
 
     def run(self):
         while True:
-            record = self.log_queue.get()
-            if record is None:
-                break
-            if record.msg == "Main script Loaded. Logging started...":
+            item = self.log_queue.get()
+            if type(item) is Control:
+                if item is STOP:
+                    break
+                self.control(item)
+                continue
+            self.handler.handle(item)
+            self.written += 1
+
+    def control(self, item):
+        try:
+            if item is ROTATE:
+                self.handler.doRollover()
+            elif item is TRUNCATE:
                 self.handler.close()
-                with open(self.handler.baseFilename, 'w', encoding='utf-8') as f:
-                    f.write("")  # Truncate the file
-                self.handler.stream = open(self.handler.baseFilename, 'a', encoding='utf-8')
-            self.handler.emit(record)
-        self.handler.close()
+                with open(self.handler.baseFilename, 'w', encoding='utf-8'):
+                    pass
+                self.handler.stream = None  # Reopened on the next write
+        except Exception as e:
+            print(f"Log {item.action} failed: {e}", file=sys.stderr)
+
+class LoggingService:
+    """Queue-backed logging for the whole process, drained by a single listener thread.
+
+    The queue is bounded. When it fills up, the overflow policy decides what happens:
+    'drop_new' discards the incoming record, 'drop_oldest' discards the oldest
+    queued record, and 'block' waits for room. Both drop policies count what they
+    lose. shutdown() drains whatever is still queued and reports how much that was.
+    With structured=True lines are written as JSON objects.
+    """
+    def __init__(self, log_file='./runtime.log', queue_size=10000, overflow='drop_new', backup_count=5, structured=False):
+        self.log_queue = queue.Queue(queue_size)
+        self.file_handler = ConcurrentRotatingFileHandler(log_file, mode='a', encoding='utf-8', backupCount=backup_count)
+        self.file_handler.setFormatter(JsonFormatter() if structured else TextFormatter())
+        self.queue_handler = QueueHandler(self.log_queue, overflow)
+        self.listener = QueueListener(self.log_queue, self.file_handler)
+        self.stopped = False
+
+    def start(self, rotate=True):
+        if rotate:
+            self.log_queue.put(ROTATE)  # Each run starts with a fresh file
+        self.listener.start()
+        root = logging.getLogger()
+        root.setLevel(logging.DEBUG)
+        root.addHandler(self.queue_handler)
+
+    def rotate(self):
+        self.log_queue.put(ROTATE)
+
+    def truncate(self):
+        self.log_queue.put(TRUNCATE)
+
+    def shutdown(self, timeout=5):
+        """Stops taking records, writes the ones still queued and returns how many that was."""
+        if self.stopped:
+            return 0
+        self.stopped = True
+        logging.getLogger().removeHandler(self.queue_handler)
+        written = self.listener.written
+        self.log_queue.put(STOP)
+        self.listener.join(timeout)
+        flushed = self.listener.written - written
+        if self.listener.is_alive():
+            # Still writing (STOP is still queued), touching the file from this thread too would interleave lines
+            print(f"Logging stopped: flush incomplete after {timeout}s, {flushed} queued records written, "
+                  f"{self.log_queue.qsize() - 1} still queued, {self.queue_handler.dropped} dropped while running", file=sys.stderr)
+            return flushed
+
+        # The listener is done, so it is safe to write the summary straight to the file
+        summary = logging.makeLogRecord({
+            'name': 'shared_logging', 'levelno': logging.INFO, 'levelname': 'INFO', 'trace_id': None,
+            'msg': f"Logging stopped: {flushed} queued records flushed on exit, {self.queue_handler.dropped} dropped while running",
+        })
+        self.file_handler.handle(summary)
+        self.file_handler.close()
+        return flushed
+
+_service = None
 
 # Function to set up logging
-def setup_logging(log_file='./runtime.log'):
-    global _logging_setup_done
-    if _logging_setup_done:
-        return  # Prevent re-initialization if already set up
-
-    handler = ConcurrentRotatingFileHandler(log_file, mode='a', encoding='utf-8', backupCount=5)
-    handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-
-    queue_handler = QueueHandler(log_queue)
-    queue_listener = QueueListener(log_queue, handler)
-
-    logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(queue_handler)
-    logger.propagate = False
-
-    # Ensure that the logging listener stops when the application exits
-    import atexit
-    atexit.register(log_queue.put, None)
-
-    # Wait for all logs to be processed before exiting
-    def cleanup():
-        log_queue.put(None)
-        queue_listener.join()
-
-    atexit.register(cleanup)
-    
-    _logging_setup_done = True  # Mark setup as done
+def setup_logging(log_file='./runtime.log', queue_size=10000, overflow='drop_new', structured=False):
+    global _service
+    if _service is not None:
+        return _service  # Prevent re-initialization if already set up
+
+    _service = LoggingService(log_file, queue_size, overflow, structured=structured)
+    _service.start()
+    # One drain on exit, after everything else that might still log
+    atexit.register(_service.shutdown)
+    return _service
@@ -1,5 +1,7 @@
-from flask import Flask, render_template
+from flask import Flask, Response, render_template
 import os
+import urllib.request
+import urllib.error
 
 # Set CWD to current file path
 script_path = os.path.abspath(__file__)
@@ -12,5 +14,16 @@ app = Flask(__name__)
 def coming_soon():
     return render_template('coming_soon.html')
 
+# The bot serves its metrics on a local port (metrics_port in config.json), this passes them through
+BOT_METRICS_URL = os.environ.get('BOT_METRICS_URL', 'http://127.0.0.1:9108/metrics')
+
+@app.route('/metrics')
+def metrics():
+    try:
+        with urllib.request.urlopen(BOT_METRICS_URL, timeout=5) as response:
+            return Response(response.read(), mimetype='text/plain')
+    except (urllib.error.URLError, OSError):
+        return Response("# bot metrics unavailable\n", status=503, mimetype='text/plain')
+
 if __name__ == '__main__':
     app.run(debug=True)